@@ -1,40 +1,76 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from pydantic import BaseModel
 from system_sync.app_detector import AppDetector
-from system_sync.backup_manager import BackupManager
+from system_sync.backup_manager import BackupManager, run_backup_process
 from system_sync.vscode_packager import VSCodePackager
+from system_sync.local_storage import LocalStorage
+from system_sync.temp_file_pool import scratch_files
 import logging
 import json
+import re
+import asyncio
+import time
+import multiprocessing
+import queue
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import tempfile
 import os
-from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, ORJSONResponse, Response
 import platform
 import shutil
+from pathlib import Path
 import uuid
+from starlette.background import BackgroundTask
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app_detector = AppDetector()
 backup_manager = BackupManager()
 
-# Define the backups directory
-BACKUPS_DIR = os.path.join(os.path.dirname(__file__), "backups")
+# Size of each read when streaming uploaded files to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB chunks
+
+# Define the backups directory (backend/backups, next to src/)
+BACKUPS_DIR = str(Path(__file__).resolve().parent.parent / "backups")
 os.makedirs(BACKUPS_DIR, exist_ok=True)
 
-# Get allowed origins from environment variable or use defaults
-ALLOWED_ORIGINS = os.environ.get(
-    "ALLOWED_ORIGINS", 
-    "http://localhost:3000,http://localhost:3001,http://localhost:3002,http://localhost:3003"
-).split(",")
+# Platform doesn't change at runtime, so resolve it once
+SYSTEM = platform.system()
+
+# Internal nginx locations for X-Accel-Redirect offload. When set, downloads
+# are handed to the reverse proxy (`location <prefix> { internal; alias ...; }`)
+# instead of streaming every byte through the event loop.
+INTERNAL_BACKUPS_PREFIX = os.environ.get("INTERNAL_BACKUPS_PREFIX")
+INTERNAL_PACKAGES_PREFIX = os.environ.get("INTERNAL_PACKAGES_PREFIX")
+
+# Directory where packaged VS Code builds are written
+PACKAGES_DIR = os.path.join(tempfile.gettempdir(), "vscode_packages")
+
+# Packages served through nginx can't be removed once the response is sent,
+# so packages older than this are swept before each new one is written
+PACKAGES_TTL = int(os.environ.get("PACKAGES_TTL", 3600))  # seconds
+
+# Get allowed origin pattern from environment variable or use defaults.
+# Starlette compiles the regex once, avoiding a list scan per request.
+# A comma-separated ALLOWED_ORIGINS list is still honored, as exact matches.
+ALLOWED_ORIGIN_REGEX = os.environ.get("ALLOWED_ORIGIN_REGEX")
+ALLOWED_ORIGINS = os.environ.get("ALLOWED_ORIGINS")
+if ALLOWED_ORIGIN_REGEX and ALLOWED_ORIGINS:
+    logger.error("Both ALLOWED_ORIGIN_REGEX and ALLOWED_ORIGINS are set; ignoring ALLOWED_ORIGINS")
+elif ALLOWED_ORIGINS:
+    ALLOWED_ORIGIN_REGEX = "^(" + "|".join(re.escape(origin.strip()) for origin in ALLOWED_ORIGINS.split(",")) + ")$"
+if not ALLOWED_ORIGIN_REGEX:
+    ALLOWED_ORIGIN_REGEX = r"^https?://(localhost|127\.0\.0\.1):(3000|3001|3002|3003)$"
 
 # Enable CORS with more permissive settings
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=ALLOWED_ORIGINS,
+    allow_origin_regex=ALLOWED_ORIGIN_REGEX,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -49,15 +85,157 @@ class RestoreRequest(BaseModel):
     backup_id: int
     files: Optional[List[str]] = None
 
-# Store progress information
-progress_store: Dict[str, Dict] = {}
+# Cache detected applications so every request doesn't rescan the filesystem
+APPS_CACHE_TTL = 30  # seconds
+_apps_cache: Optional[Tuple[float, List[Dict]]] = None
+_apps_cache_lock = asyncio.Lock()
+
+async def get_applications(refresh: bool = False) -> List[Dict]:
+    """Return detected applications, rescanning at most once per APPS_CACHE_TTL."""
+    global _apps_cache
+    async with _apps_cache_lock:
+        if not refresh and _apps_cache and time.monotonic() - _apps_cache[0] < APPS_CACHE_TTL:
+            return _apps_cache[1]
+        apps = await asyncio.to_thread(app_detector.detect_applications)
+        _apps_cache = (time.monotonic(), apps)
+        return apps
 
-def update_progress(app_name: str, progress: float, status: str = "in-progress"):
+# Store progress information, bounded in size and expired after PROGRESS_TTL
+PROGRESS_MAX_ENTRIES = 256
+PROGRESS_TTL = 60 * 60  # seconds
+progress_store: "OrderedDict[str, Dict]" = OrderedDict()
+_progress_lock = asyncio.Lock()
+
+async def update_progress(app_name: str, progress: float, status: str = "in-progress"):
     """Update progress information for an app."""
-    progress_store[app_name] = {
-        "progress": progress,
-        "status": status
-    }
+    async with _progress_lock:
+        progress_store[app_name] = {
+            "progress": progress,
+            "status": status,
+            "updated_at": time.monotonic()
+        }
+        progress_store.move_to_end(app_name)
+        while len(progress_store) > PROGRESS_MAX_ENTRIES:
+            progress_store.popitem(last=False)
+
+async def get_progress(app_name: str) -> Optional[Dict]:
+    """Get progress information for an app, dropping it if expired."""
+    async with _progress_lock:
+        entry = progress_store.get(app_name)
+        if entry and time.monotonic() - entry["updated_at"] > PROGRESS_TTL:
+            del progress_store[app_name]
+            entry = None
+        if not entry:
+            return None
+        return {"progress": entry["progress"], "status": entry["status"]}
+
+# Backups run in worker processes so zip compression doesn't block the event loop
+BACKUP_WORKERS = int(os.environ.get("BACKUP_WORKERS", 2))
+BACKUP_EXECUTOR = ProcessPoolExecutor(max_workers=BACKUP_WORKERS)
+
+# Progress updates from backup workers are sent through a managed queue, read on
+# a dedicated thread so it doesn't hold one of the default executor's threads
+PROGRESS_POLL_TIMEOUT = 0.5  # seconds
+# Put on the progress queue at shutdown to stop the drain task
+_PROGRESS_STOP = "stop"
+_progress_manager = None
+_progress_queue = None
+_progress_reader = None
+_progress_task: Optional[asyncio.Task] = None
+
+def _next_progress_item():
+    """Wait briefly for a progress update, returning None if none arrived."""
+    try:
+        return _progress_queue.get(timeout=PROGRESS_POLL_TIMEOUT)
+    except queue.Empty:
+        return None
+
+async def drain_backup_progress():
+    """Forward progress updates from backup workers into the progress store until _PROGRESS_STOP arrives."""
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await loop.run_in_executor(_progress_reader, _next_progress_item)
+        if item is None:
+            continue
+        if item == _PROGRESS_STOP:
+            break
+        try:
+            await update_progress(*item)
+        except Exception as e:
+            logger.error(f"Error recording backup progress {item}: {str(e)}")
+
+def _log_drain_exit(task: asyncio.Task):
+    """Report a drain task that died, rather than losing its exception."""
+    if not task.cancelled() and task.exception():
+        logger.error(f"Backup progress drain stopped: {task.exception()}")
+
+@app.on_event("startup")
+async def start_backup_workers():
+    global _progress_manager, _progress_queue, _progress_reader, _progress_task
+    _progress_manager = multiprocessing.Manager()
+    _progress_queue = _progress_manager.Queue()
+    _progress_reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup-progress")
+    _progress_task = asyncio.create_task(drain_backup_progress())
+    _progress_task.add_done_callback(_log_drain_exit)
+
+@app.on_event("shutdown")
+async def stop_backup_workers():
+    BACKUP_EXECUTOR.shutdown(wait=False)
+    # Let the drain task forward what is queued and exit before the manager goes away
+    if _progress_task is not None:
+        _progress_queue.put(_PROGRESS_STOP)
+        try:
+            await asyncio.wait_for(_progress_task, PROGRESS_POLL_TIMEOUT * 4)
+        except asyncio.TimeoutError:
+            logger.warning("Backup progress drain did not stop in time, cancelling it")
+        except Exception:
+            pass  # Already reported by _log_drain_exit
+    if _progress_reader is not None:
+        _progress_reader.shutdown(wait=True)
+    if _progress_manager is not None:
+        _progress_manager.shutdown()
+
+@app.on_event("shutdown")
+async def close_storage():
+    await backup_manager.storage.aclose()
+
+# Bound how many downloads/packaging jobs are prepared at once
+MAX_CONCURRENT_DOWNLOADS = int(os.environ.get("MAX_CONCURRENT_DOWNLOADS", 4))
+DOWNLOAD_SLOT_TIMEOUT = float(os.environ.get("DOWNLOAD_SLOT_TIMEOUT", 30))  # seconds
+DOWNLOAD_SEM = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+async def download_slot():
+    """Hold a download slot for the duration of a request, or reject with 429."""
+    try:
+        await asyncio.wait_for(DOWNLOAD_SEM.acquire(), DOWNLOAD_SLOT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=429, detail="Too many downloads in progress, try again later")
+    try:
+        yield
+    finally:
+        DOWNLOAD_SEM.release()
+
+def accel_redirect_response(path: str, root: str, prefix: str, filename: str, media_type: str) -> Response:
+    """Build an empty response telling nginx to serve `path` from its internal location."""
+    rel_path = os.path.relpath(path, root).replace(os.sep, "/")
+    return Response(
+        headers={
+            "X-Accel-Redirect": f"{prefix.rstrip('/')}/{rel_path}",
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        },
+        media_type=media_type
+    )
+
+def sweep_packages() -> None:
+    """Remove packages in PACKAGES_DIR older than PACKAGES_TTL."""
+    cutoff = time.time() - PACKAGES_TTL
+    with os.scandir(PACKAGES_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError as e:
+                logger.warning(f"Failed to remove old package {entry.path}: {e}")
 
 @app.get("/")
 def read_root():
@@ -71,20 +249,26 @@ def read_root():
 async def list_applications() -> List[Dict]:
     """List all detected applications."""
     try:
-        return app_detector.detect_applications()
+        return await get_applications()
+    except Exception as e:
+        logger.error(f"Error detecting applications: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to detect applications")
+
+@app.post("/apps/refresh")
+async def refresh_applications() -> List[Dict]:
+    """Rescan installed applications, bypassing the cache."""
+    try:
+        return await get_applications(refresh=True)
     except Exception as e:
         logger.error(f"Error detecting applications: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to detect applications")
 
 @app.post("/backup")
-async def backup_app(
-    request: BackupRequest,
-    background_tasks: BackgroundTasks
-) -> Dict:
+async def backup_app(request: BackupRequest) -> Dict:
     """Create a backup for an application"""
     try:
         # Get application settings
-        apps = app_detector.detect_applications()
+        apps = await get_applications()
         app = next((a for a in apps if a["name"] == request.app_name), None)
         
         if not app:
@@ -94,16 +278,25 @@ async def backup_app(
             raise HTTPException(status_code=404, detail=f"No settings found for {request.app_name}")
             
         # Initialize progress
-        update_progress(request.app_name, 0, "starting")
+        await update_progress(request.app_name, 0, "starting")
         
-        # Start backup in background
-        background_tasks.add_task(
-            backup_manager.create_backup,
+        # Start backup in a worker process
+        loop = asyncio.get_running_loop()
+        job = loop.run_in_executor(
+            BACKUP_EXECUTOR,
+            run_backup_process,
             request.app_name,
-            app["settings"],
-            lambda p: update_progress(request.app_name, p)
+            [dict(setting) for setting in app["settings"]],  # Copy so the cached entry isn't mutated
+            _progress_queue
         )
         
+        def on_backup_done(future):
+            if not future.cancelled() and future.exception():
+                logger.error(f"Backup worker for {request.app_name} failed: {future.exception()}")
+                asyncio.ensure_future(update_progress(request.app_name, 0, "failed"))
+        
+        job.add_done_callback(on_backup_done)
+        
         return {"status": "backup started"}
         
     except HTTPException:
@@ -115,9 +308,10 @@ async def backup_app(
 @app.get("/backup/progress/{app_name}")
 async def get_backup_progress(app_name: str) -> Dict:
     """Get backup progress for an application."""
-    if app_name not in progress_store:
+    progress = await get_progress(app_name)
+    if progress is None:
         raise HTTPException(status_code=404, detail="No backup in progress")
-    return progress_store[app_name]
+    return progress
 
 @app.get("/backups")
 async def list_backups(app_name: Optional[str] = None) -> Dict:
@@ -157,44 +351,62 @@ async def delete_backup(backup_id: int) -> Dict:
         logger.error(f"Error deleting backup: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to delete backup")
 
-@app.get("/backup/download/{backup_id}")
+@app.get("/backup/download/{backup_id}", dependencies=[Depends(download_slot)])
 async def download_backup(backup_id: int):
     """Download a backup file."""
     try:
         # Get backup information
-        backups = await backup_manager.list_backups()
-        all_backups = []
-        for app_backups in backups.values():
-            all_backups.extend(app_backups)
-        
-        backup_info = next((b for b in all_backups if b['id'] == backup_id), None)
+        backup_info = await backup_manager.get_backup(backup_id)
         
         if not backup_info:
             logger.error(f"Backup with ID {backup_id} not found")
             raise HTTPException(status_code=404, detail="Backup not found")
         
-        # Create temporary file for downloaded backup
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
-            temp_path = temp_file.name
+        filename = backup_info['filename']
         
-        # Download backup to temporary file
-        logger.info(f"Downloading backup from {backup_info['storage_path']} to {temp_path}")
-        success = await backup_manager.storage.download_backup(
-            backup_info['storage_path'],
-            temp_path
-        )
+        # Deduplicated backups store only a manifest, so their files are rebuilt into a real zip
+        if backup_info['metadata'].get('dedup'):
+            temp_path = scratch_files.acquire()
+            if not await backup_manager.export_backup(backup_info, temp_path):
+                scratch_files.release(temp_path)
+                raise HTTPException(status_code=500, detail="Failed to rebuild backup file")
+            return FileResponse(
+                path=temp_path,
+                filename=filename,
+                media_type="application/zip",
+                background=BackgroundTask(scratch_files.release, temp_path)
+            )
         
-        if not success:
-            logger.error("Failed to download backup file")
-            raise HTTPException(status_code=500, detail="Failed to download backup file")
+        # Let nginx serve the stored file directly when offload is configured
+        if INTERNAL_BACKUPS_PREFIX:
+            return accel_redirect_response(
+                backup_info['storage_path'],
+                str(backup_manager.storage.storage_dir),
+                INTERNAL_BACKUPS_PREFIX,
+                filename,
+                "application/zip"
+            )
         
-        # Return the file as a response
-        filename = backup_info['filename']
-        return FileResponse(
-            path=temp_path, 
-            filename=filename,
+        storage = backup_manager.storage
+        
+        # Local backups are already on disk, so serve the stored file directly
+        if isinstance(storage, LocalStorage):
+            if not os.path.exists(backup_info['storage_path']):
+                logger.error(f"Backup file missing: {backup_info['storage_path']}")
+                raise HTTPException(status_code=404, detail="Backup file not found")
+            return FileResponse(
+                path=backup_info['storage_path'],
+                filename=filename,
+                media_type="application/zip"
+            )
+        
+        # Otherwise stream the backup straight from storage to the client
+        return StreamingResponse(
+            storage.iter_backup(backup_info['storage_path']),
             media_type="application/zip",
-            background=BackgroundTasks().add_task(lambda: os.remove(temp_path))
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"'
+            }
         )
     except HTTPException:
         raise
@@ -224,43 +436,27 @@ async def upload_backup(
                 detail="Invalid metadata format"
             )
         
-        # Save file to temporary location
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
-                content = await file.read()
-                temp_file.write(content)
-                temp_path = temp_file.name
-                logger.info(f"Saved temporary file to: {temp_path}")
-                logger.info(f"File size: {len(content)} bytes")
-        except Exception as e:
-            logger.error(f"Failed to save temporary file: {e}")
+        # Stream the upload straight into storage in chunks so large uploads
+        # are written once and never sit fully in memory
+        async def read_chunks():
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                yield chunk
+
+        storage_path = await backup_manager.storage.upload_backup_stream(
+            app_name,
+            read_chunks(),
+            metadata_dict,
+            total_size=getattr(file, 'size', None)
+        )
+
+        if not storage_path:
+            logger.error("Failed to store backup")
             raise HTTPException(
                 status_code=500,
-                detail=f"Failed to save uploaded file: {str(e)}"
-            )
-
-        try:
-            # Store backup using local storage
-            storage_path = await backup_manager.storage.upload_backup(
-                app_name,
-                temp_path,
-                metadata_dict,
-                total_size=os.path.getsize(temp_path)
+                detail="Failed to store backup in the system"
             )
 
-            if not storage_path:
-                logger.error("Failed to store backup")
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to store backup in the system"
-                )
-
-            return {"status": "backup created", "path": storage_path}
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                logger.info("Cleaned up temporary file")
+        return {"status": "backup created", "path": storage_path}
 
     except HTTPException:
         raise
@@ -272,17 +468,12 @@ async def upload_backup(
             detail=f"Failed to process backup: {str(e)}"
         )
 
-@app.get("/backup/package-vscode/{backup_id}")
+@app.get("/backup/package-vscode/{backup_id}", dependencies=[Depends(download_slot)])
 async def package_vscode(backup_id: int):
     """Create a packaged VS Code with user settings from a backup."""
     try:
         # Get backup information
-        backups = await backup_manager.list_backups()
-        all_backups = []
-        for app_backups in backups.values():
-            all_backups.extend(app_backups)
-        
-        backup_info = next((b for b in all_backups if b['id'] == backup_id), None)
+        backup_info = await backup_manager.get_backup(backup_id)
         
         if not backup_info:
             logger.error(f"Backup with ID {backup_id} not found")
@@ -293,59 +484,72 @@ async def package_vscode(backup_id: int):
             logger.error(f"Backup ID {backup_id} is not a VS Code backup")
             raise HTTPException(status_code=400, detail="Not a VS Code backup")
         
-        # Create temporary file for downloaded backup
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
-            temp_path = temp_file.name
-        
-        # Download backup to temporary file
-        logger.info(f"Downloading backup from {backup_info['storage_path']} to {temp_path}")
-        success = await backup_manager.storage.download_backup(
-            backup_info['storage_path'],
-            temp_path
-        )
-        
-        if not success:
-            logger.error("Failed to download backup file")
-            raise HTTPException(status_code=500, detail="Failed to download backup file")
-        
         # Determine the appropriate output format based on platform
-        system = platform.system()
-        if system == "Darwin":
+        if SYSTEM == "Darwin":
             # On macOS, create a DMG file
             output_filename = f"VSCode_with_Settings_{backup_id}.dmg"
             media_type = "application/x-apple-diskimage"
-        elif system == "Windows":
+        elif SYSTEM == "Windows":
             # On Windows, we would create an executable installer
             # For now, we'll return an error since it's not implemented
-            os.remove(temp_path)
             raise HTTPException(status_code=501, detail="Windows packaging not implemented yet")
         else:
             # For other platforms, we'll return an error since it's not implemented
-            os.remove(temp_path)
             raise HTTPException(status_code=501, detail="Packaging not implemented for this platform")
         
+        # Local backups can be packaged in place; others are fetched to a temp file
+        temp_path = None
+        if isinstance(backup_manager.storage, LocalStorage):
+            backup_path = backup_info['storage_path']
+        else:
+            temp_path = scratch_files.acquire()
+            
+            logger.info(f"Downloading backup from {backup_info['storage_path']} to {temp_path}")
+            success = await backup_manager.storage.download_backup(
+                backup_info['storage_path'],
+                temp_path
+            )
+            
+            if not success:
+                scratch_files.release(temp_path)
+                logger.error("Failed to download backup file")
+                raise HTTPException(status_code=500, detail="Failed to download backup file")
+            backup_path = temp_path
+        
         # Create output path for packaged VS Code
-        output_dir = os.path.join(tempfile.gettempdir(), "vscode_packages")
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, output_filename)
+        os.makedirs(PACKAGES_DIR, exist_ok=True)
+        sweep_packages()
+        output_path = os.path.join(PACKAGES_DIR, output_filename)
         
         # Create packaged VS Code
         packager = VSCodePackager()
-        success = await packager.create_package(temp_path, output_path)
-        
-        # Clean up temporary backup file
-        os.remove(temp_path)
+        try:
+            success = await packager.create_package(backup_path, output_path)
+        finally:
+            # Return the scratch file to the pool
+            if temp_path:
+                scratch_files.release(temp_path)
         
         if not success:
             logger.error("Failed to create packaged VS Code")
             raise HTTPException(status_code=500, detail="Failed to create packaged VS Code")
         
+        # Let nginx serve the package when offload is configured
+        if INTERNAL_PACKAGES_PREFIX:
+            return accel_redirect_response(
+                output_path,
+                PACKAGES_DIR,
+                INTERNAL_PACKAGES_PREFIX,
+                output_filename,
+                media_type
+            )
+        
         # Return the packaged VS Code as a response
         return FileResponse(
             path=output_path, 
             filename=output_filename,
             media_type=media_type,
-            background=BackgroundTasks().add_task(lambda: os.remove(output_path))
+            background=BackgroundTask(os.remove, output_path)
         )
     except HTTPException:
         raise
@@ -354,7 +558,7 @@ async def package_vscode(backup_id: int):
         logger.exception("Full error details:")
         raise HTTPException(status_code=500, detail=f"Failed to package VS Code: {str(e)}")
 
-@app.get("/api/backups/{backup_id}/package-vscode")
+@app.get("/api/backups/{backup_id}/package-vscode", dependencies=[Depends(download_slot)])
 async def package_vscode(backup_id: str):
     """
     Package VS Code with settings from a backup.
@@ -363,15 +567,11 @@ async def package_vscode(backup_id: str):
         backup_id: ID of the backup to use
         
     Returns:
-        StreamingResponse with the packaged VS Code application
+        FileResponse with the packaged VS Code application
     """
     try:
         logger.info(f"Received request to package VS Code with backup ID: {backup_id}")
         
-        # Define the backups directory
-        BACKUPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backups")
-        logger.info(f"Backups directory: {BACKUPS_DIR}")
-        
         # Get the backup file path
         backup_path = os.path.join(BACKUPS_DIR, f"{backup_id}.zip")
         logger.info(f"Backup file path: {backup_path}")
@@ -417,13 +617,12 @@ async def package_vscode(backup_id: str):
                 content={"success": False, "error": f"Failed to create package file"}
             )
         
-        # Return the package as a streaming response
-        return StreamingResponse(
-            open(package_path, "rb"),
+        # Return the package as a file response and remove it once sent
+        return FileResponse(
+            path=package_path,
+            filename=filename,
             media_type=media_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
+            background=BackgroundTask(os.remove, package_path)
         )
     except Exception as e:
         logger.exception(f"Error packaging VS Code: {str(e)}")
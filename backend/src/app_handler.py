@@ -1,10 +1,12 @@
 import os
 import json
+import asyncio
 import shutil
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 import platform
 import psutil
+from system_sync.fs_utils import copy_file
 
 class AppHandler:
     def __init__(self):
@@ -23,61 +25,95 @@ class AppHandler:
         else:  # Linux
             self.app_support = os.path.join(self.home, ".config")
             self.preferences = self.app_support
+        self.game_saves_dir = os.path.join(self.home, "Documents", "My Games")
+        # Default macOS and Windows filesystems match names regardless of case
+        self._fold_case = self.system in ("Darwin", "Windows")
+        self.invalidate_entry_cache()
             
-    def get_installed_apps(self) -> List[Dict[str, str]]:
+    def invalidate_entry_cache(self):
+        """Forget cached directory listings so the next lookup rescans."""
+        self._entry_cache: Dict[str, Set[str]] = {}
+        
+    def _dir_entries(self, path: str) -> Set[str]:
+        """Get the names in a directory, casefolded where the filesystem ignores case, scanning it at most once."""
+        if path not in self._entry_cache:
+            try:
+                with os.scandir(path) as it:
+                    if self._fold_case:
+                        self._entry_cache[path] = {entry.name.casefold() for entry in it}
+                    else:
+                        self._entry_cache[path] = {entry.name for entry in it}
+            except OSError:
+                self._entry_cache[path] = set()
+        return self._entry_cache[path]
+        
+    def _has_entry(self, path: str, name: str) -> bool:
+        """Check whether a directory contains name, matching case the way the filesystem does."""
+        if self._fold_case:
+            name = name.casefold()
+        return name in self._dir_entries(path)
+            
+    async def get_installed_apps(self) -> List[Dict[str, str]]:
         """Get list of installed applications with their paths."""
         apps = []
         if self.system == "Darwin":
-            apps.extend(self._get_macos_apps())
+            apps.extend(await self._get_macos_apps())
         elif self.system == "Windows":
             apps.extend(self._get_windows_apps())
         else:
             apps.extend(self._get_linux_apps())
         return apps
         
-    def _get_macos_apps(self) -> List[Dict[str, str]]:
-        """Get installed applications on macOS."""
+    def _scan_macos_location(self, location: str) -> List[Dict[str, str]]:
+        """Get the .app bundles in a single macOS applications folder."""
         apps = []
+        if os.path.exists(location):
+            with os.scandir(location) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".app") and entry.is_dir():
+                        apps.append({
+                            "name": entry.name[:-len(".app")],
+                            "path": entry.path,
+                            "type": "application"
+                        })
+        return apps
+        
+    async def _get_macos_apps(self) -> List[Dict[str, str]]:
+        """Get installed applications on macOS."""
         app_locations = [
             "/Applications",
             os.path.join(self.home, "Applications")
         ]
         
-        for location in app_locations:
-            if os.path.exists(location):
-                for app in os.listdir(location):
-                    if app.endswith(".app"):
-                        apps.append({
-                            "name": app.replace(".app", ""),
-                            "path": os.path.join(location, app),
-                            "type": "application"
-                        })
-        return apps
+        # Scan the locations concurrently; they are often on different volumes
+        results = await asyncio.gather(*(
+            asyncio.to_thread(self._scan_macos_location, location)
+            for location in app_locations
+        ))
+        return [app for location_apps in results for app in location_apps]
         
     def get_app_settings(self, app_name: str) -> Dict[str, str]:
         """Get settings and configuration paths for a specific application."""
         settings = {}
         
         # Check common locations
-        app_support_path = os.path.join(self.app_support, app_name)
-        if os.path.exists(app_support_path):
-            settings["app_support"] = app_support_path
+        if self._has_entry(self.app_support, app_name):
+            settings["app_support"] = os.path.join(self.app_support, app_name)
             
-        pref_path = os.path.join(self.preferences, f"{app_name}.plist")
-        if os.path.exists(pref_path):
-            settings["preferences"] = pref_path
+        pref_name = f"{app_name}.plist"
+        if self._has_entry(self.preferences, pref_name):
+            settings["preferences"] = os.path.join(self.preferences, pref_name)
             
         # Add game-specific paths
         if self.system == "Windows":
-            documents = os.path.join(os.path.expanduser("~"), "Documents")
-            game_saves = os.path.join(documents, "My Games", app_name)
-            if os.path.exists(game_saves):
-                settings["game_saves"] = game_saves
+            if self._has_entry(self.game_saves_dir, app_name):
+                settings["game_saves"] = os.path.join(self.game_saves_dir, app_name)
                 
         return settings
         
     def backup_app_settings(self, app_name: str, backup_dir: str) -> Dict[str, str]:
         """Backup application settings to specified directory."""
+        self.invalidate_entry_cache()
         settings = self.get_app_settings(app_name)
         backup_paths = {}
         
@@ -87,9 +123,9 @@ class AppHandler:
                 os.makedirs(os.path.dirname(backup_path), exist_ok=True)
                 
                 if os.path.isfile(path):
-                    shutil.copy2(path, backup_path)
+                    copy_file(path, backup_path)
                 else:
-                    shutil.copytree(path, backup_path, dirs_exist_ok=True)
+                    shutil.copytree(path, backup_path, dirs_exist_ok=True, copy_function=copy_file)
                     
                 backup_paths[setting_type] = backup_path
                 
@@ -113,8 +149,8 @@ class AppHandler:
                         shutil.rmtree(path)
                         
                 if os.path.isfile(backup_setting_path):
-                    shutil.copy2(backup_setting_path, path)
+                    copy_file(backup_setting_path, path)
                 else:
-                    shutil.copytree(backup_setting_path, path, dirs_exist_ok=True)
+                    shutil.copytree(backup_setting_path, path, dirs_exist_ok=True, copy_function=copy_file)
                     
         return True 
\ No newline at end of file
@@ -3,6 +3,12 @@ import yaml
 from typing import Dict, Any, List
 from pathlib import Path
 
+# Prefer the libyaml C bindings when available
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
 class ConfigManager:
     def __init__(self, config_dir: str = None):
         self.config_dir = config_dir or str(Path.home() / '.env_sync' / 'configs')
@@ -12,7 +18,7 @@ class ConfigManager:
         """Save application configuration to a YAML file."""
         config_path = os.path.join(self.config_dir, f"{app_name}.yaml")
         with open(config_path, 'w') as f:
-            yaml.safe_dump(config, f)
+            yaml.dump(config, f, Dumper=SafeDumper)
             
     def load_app_config(self, app_name: str) -> Dict[str, Any]:
         """Load application configuration from YAML file."""
@@ -20,12 +26,13 @@ class ConfigManager:
         if not os.path.exists(config_path):
             return {}
         with open(config_path, 'r') as f:
-            return yaml.safe_load(f)
+            return yaml.load(f, Loader=SafeLoader)
             
     def list_saved_configs(self) -> List[str]:
         """List all saved application configurations."""
-        return [f.replace('.yaml', '') for f in os.listdir(self.config_dir)
-                if f.endswith('.yaml')]
+        with os.scandir(self.config_dir) as entries:
+            return [entry.name[:-len('.yaml')] for entry in entries
+                    if entry.name.endswith('.yaml') and entry.is_file()]
                 
     def delete_app_config(self, app_name: str) -> None:
         """Delete an application's saved configuration."""
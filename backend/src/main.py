@@ -1,5 +1,6 @@
 import click
 import os
+import asyncio
 from pathlib import Path
 from typing import List
 from config_manager import ConfigManager
@@ -14,7 +15,7 @@ def cli():
 def list_apps():
     """List all detected applications on the system."""
     app_handler = AppHandler()
-    apps = app_handler.get_installed_apps()
+    apps = asyncio.run(app_handler.get_installed_apps())
     
     click.echo("Detected Applications:")
     for app in apps:
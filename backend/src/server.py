@@ -1,5 +1,6 @@
 import uvicorn
 import os
+import platform
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if present
@@ -10,8 +11,12 @@ if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8001))
     host = os.environ.get("HOST", "0.0.0.0")
     log_level = os.environ.get("LOG_LEVEL", "info").lower()
+    reload = os.environ.get("ENVIRONMENT", "production").lower() == "development"
+    # Backup progress and the app cache live in-process, so only scale out
+    # once progress polling doesn't need to hit the worker that owns the job
+    workers = int(os.environ.get("WORKERS", 1))
     
-    print(f"Starting server on {host}:{port} with log level {log_level}")
+    print(f"Starting server on {host}:{port} with log level {log_level} and {workers} worker(s)")
     
     # Start the server
     uvicorn.run(
@@ -19,5 +24,9 @@ if __name__ == "__main__":
         host=host,
         port=port,
         log_level=log_level,
-        reload=os.environ.get("ENVIRONMENT", "production").lower() == "development"
+        loop="asyncio" if platform.system() == "Windows" else "uvloop",  # uvloop has no Windows support
+        http="httptools",
+        # reload is incompatible with multiple workers
+        workers=1 if reload else workers,
+        reload=reload
     ) 
\ No newline at end of file
@@ -1,66 +1,83 @@
 import os
+import re
 import platform
 import json
 from pathlib import Path
+from functools import cached_property
 from typing import Dict, List, Optional
 import plistlib
 import logging
+from .fs_utils import tree_size
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Resolved once per process; none of these change while the server runs
+SYSTEM = platform.system()
+HOME = str(Path.home())
+PROGRAM_FILES = os.environ.get("ProgramFiles", "C:\\Program Files")
+PROGRAM_FILES_X86 = os.environ.get("ProgramFiles(x86)", "C:\\Program Files (x86)")
+APPDATA = os.environ.get("APPDATA", "")
+
+# Default stat parallelism; Windows serializes much of the file-open path per volume
+MAX_STAT_WORKERS = 32
+MAX_STAT_WORKERS_WINDOWS = 8
+
+# Name keywords per category, in priority order
+CATEGORY_KEYWORDS = {
+    'Development': ['code', 'studio', 'intellij', 'eclipse', 'sublime', 'vim'],
+    'Gaming': ['steam', 'epic', 'battle.net', 'game', 'unity'],
+    'Creative': ['photoshop', 'illustrator', 'premiere', 'figma', 'sketch'],
+    'Productivity': ['office', 'excel', 'word', 'powerpoint', 'slack', 'zoom'],
+}
+
+# One lookahead alternative per category, anchored at the start so the first
+# category (not the leftmost keyword) wins; the matching group names the category
+_CATEGORY_RE = re.compile('^(?:' + '|'.join(
+    f"(?=.*(?:{'|'.join(map(re.escape, keywords))}))(?P<{category}>)"
+    for category, keywords in CATEGORY_KEYWORDS.items()
+) + ')', re.IGNORECASE | re.DOTALL)
+
 class AppDetector:
-    def __init__(self):
-        self.system = platform.system()
-        self._init_paths()
+    def __init__(self, max_stat_workers: Optional[int] = None):
+        self.system = SYSTEM
+        self.home = HOME
+        # Threads used to stat files when sizing settings folders
+        self.max_stat_workers = max_stat_workers or (
+            MAX_STAT_WORKERS_WINDOWS if self.system == "Windows" else MAX_STAT_WORKERS
+        )
 
-    def _init_paths(self):
-        """Initialize system-specific paths."""
-        self.home = str(Path.home())
-        
+    @cached_property
+    def app_locations(self) -> List[str]:
+        """Folders that hold installed applications on this system."""
+        if self.system == "Darwin":  # macOS
+            return ["/Applications", os.path.join(self.home, "Applications")]
+        elif self.system == "Windows":
+            return [PROGRAM_FILES, PROGRAM_FILES_X86]
+        else:  # Linux
+            return ["/usr/share/applications", os.path.join(self.home, ".local", "share", "applications")]
+
+    @cached_property
+    def app_support(self) -> str:
+        """Per-user application data folder."""
         if self.system == "Darwin":  # macOS
-            self.app_locations = [
-                "/Applications",
-                os.path.join(self.home, "Applications")
-            ]
-            self.app_support = os.path.join(self.home, "Library", "Application Support")
-            self.preferences = os.path.join(self.home, "Library", "Preferences")
+            return os.path.join(self.home, "Library", "Application Support")
         elif self.system == "Windows":
-            self.app_locations = [
-                os.path.join(os.environ.get("ProgramFiles", "C:\\Program Files")),
-                os.path.join(os.environ.get("ProgramFiles(x86)", "C:\\Program Files (x86)"))
-            ]
-            self.app_support = os.path.join(os.environ.get("APPDATA", ""))
-            self.preferences = self.app_support
+            return APPDATA
         else:  # Linux
-            self.app_locations = [
-                "/usr/share/applications",
-                os.path.join(self.home, ".local", "share", "applications")
-            ]
-            self.app_support = os.path.join(self.home, ".config")
-            self.preferences = self.app_support
+            return os.path.join(self.home, ".config")
+
+    @cached_property
+    def preferences(self) -> str:
+        """Per-user preferences folder."""
+        if self.system == "Darwin":  # macOS
+            return os.path.join(self.home, "Library", "Preferences")
+        return self.app_support
 
     def get_category(self, app_name: str, app_path: str) -> str:
         """Determine application category based on location and name."""
-        app_name_lower = app_name.lower()
-        
-        # Development tools
-        if any(term in app_name_lower for term in ['code', 'studio', 'intellij', 'eclipse', 'sublime', 'vim']):
-            return 'Development'
-        
-        # Gaming
-        if any(term in app_name_lower for term in ['steam', 'epic', 'battle.net', 'game', 'unity']):
-            return 'Gaming'
-        
-        # Creative
-        if any(term in app_name_lower for term in ['photoshop', 'illustrator', 'premiere', 'figma', 'sketch']):
-            return 'Creative'
-        
-        # Productivity
-        if any(term in app_name_lower for term in ['office', 'excel', 'word', 'powerpoint', 'slack', 'zoom']):
-            return 'Productivity'
-            
-        return 'Other'
+        match = _CATEGORY_RE.match(app_name)
+        return match.lastgroup if match else 'Other'
 
     def get_app_settings(self, app_name: str) -> List[Dict]:
         """Get all settings locations for an application."""
@@ -69,7 +86,7 @@ class AppDetector:
         # Check Application Support
         app_support_path = os.path.join(self.app_support, app_name)
         if os.path.exists(app_support_path):
-            size = sum(f.stat().st_size for f in Path(app_support_path).rglob('*') if f.is_file())
+            size = tree_size(app_support_path, self.max_stat_workers)
             settings.append({
                 "name": "Application Support",
                 "path": app_support_path,
@@ -94,7 +111,7 @@ class AppDetector:
         if self.system == "Windows":
             documents = os.path.join(self.home, "Documents", "My Games", app_name)
             if os.path.exists(documents):
-                size = sum(f.stat().st_size for f in Path(documents).rglob('*') if f.is_file())
+                size = tree_size(documents, self.max_stat_workers)
                 settings.append({
                     "name": "Game Saves",
                     "path": documents,
@@ -105,10 +122,11 @@ class AppDetector:
 
         return settings
 
-    def get_vscode_settings(self) -> Dict:
-        """Get VSCode settings and paths."""
+    @cached_property
+    def _vscode_settings(self) -> Optional[Dict]:
+        """Build the VSCode entry once; its paths only depend on the platform and home."""
         if self.system == "Darwin":
-            vscode_path = os.path.join(self.app_support, "Code")
+            vscode_path = f"{self.app_support}/Code"
             return {
                 "name": "Visual Studio Code",
                 "path": "/Applications/Visual Studio Code.app",
@@ -117,22 +135,22 @@ class AppDetector:
                 "settings": [
                     {
                         "type": "userData",
-                        "path": os.path.join(vscode_path, "User"),
+                        "path": f"{vscode_path}/User",
                         "description": "User settings and configurations"
                     },
                     {
                         "type": "extensions",
-                        "path": os.path.join(self.home, ".vscode", "extensions"),
+                        "path": f"{self.home}/.vscode/extensions",
                         "description": "Installed extensions"
                     },
                     {
                         "type": "extensionGlobalStorage",
-                        "path": os.path.join(vscode_path, "User", "globalStorage"),
+                        "path": f"{vscode_path}/User/globalStorage",
                         "description": "Extension global data"
                     },
                     {
                         "type": "workspaceStorage",
-                        "path": os.path.join(vscode_path, "User", "workspaceStorage"),
+                        "path": f"{vscode_path}/User/workspaceStorage",
                         "description": "Workspace-specific data"
                     }
                 ]
@@ -140,6 +158,13 @@ class AppDetector:
         # Add Windows and Linux paths if needed
         return None
 
+    def get_vscode_settings(self) -> Dict:
+        """Get VSCode settings and paths.
+
+        The returned dict is shared between calls and must not be modified.
+        """
+        return self._vscode_settings
+
     def detect_applications(self) -> List[Dict]:
         """Detect installed applications and their settings."""
         applications = []
@@ -158,22 +183,32 @@ class AppDetector:
         
         return applications
 
-    def get_chrome_settings(self) -> Dict:
-        """Get Chrome settings and paths."""
+    @cached_property
+    def _chrome_settings(self) -> Optional[Dict]:
+        """Build the Chrome entry once; its paths only depend on the platform and home."""
         if self.system == "Darwin":
-            chrome_path = os.path.join(self.app_support, "Google", "Chrome")
-            if os.path.exists(chrome_path):
-                return {
-                    "name": "Google Chrome",
-                    "path": "/Applications/Google Chrome.app",
-                    "category": "Other",
-                    "type": "Application",
-                    "settings": [
-                        {
-                            "type": "profile",
-                            "path": chrome_path,
-                            "description": "User profile data"
-                        }
-                    ]
-                }
-        return None 
\ No newline at end of file
+            return {
+                "name": "Google Chrome",
+                "path": "/Applications/Google Chrome.app",
+                "category": "Other",
+                "type": "Application",
+                "settings": [
+                    {
+                        "type": "profile",
+                        "path": f"{self.app_support}/Google/Chrome",
+                        "description": "User profile data"
+                    }
+                ]
+            }
+        return None
+
+    def get_chrome_settings(self) -> Dict:
+        """Get Chrome settings and paths.
+
+        The returned dict is shared between calls and must not be modified.
+        """
+        chrome = self._chrome_settings
+        # Installation is checked on every call so a refresh picks up new installs
+        if chrome and os.path.exists(chrome["settings"][0]["path"]):
+            return chrome
+        return None
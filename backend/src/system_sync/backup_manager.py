@@ -1,34 +1,175 @@
 import os
+import io
+import asyncio
 import shutil
 import json
 import zipfile
-import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 import logging
 from .local_storage import LocalStorage
+from .temp_file_pool import scratch_files
+from .fs_utils import scandir_walk
+from .chunk_store import ChunkStore, MANIFEST_NAME, read_manifest
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Settings trees are dominated by already-compressed data, so favour speed over ratio
+BACKUP_COMPRESSION = zipfile.ZIP_DEFLATED
+BACKUP_COMPRESSION_LEVEL = int(os.environ.get("BACKUP_COMPRESSION_LEVEL", 1))
+# Minimum work between progress callbacks while archiving
+PROGRESS_EVERY_FILES = 64
+PROGRESS_EVERY_BYTES = 16 * 1024 * 1024
+# Buffer size used when streaming archive members to disk on restore
+RESTORE_CHUNK_SIZE = 1024 * 1024
+# Backups up to this size are restored from memory instead of a scratch file
+RESTORE_IN_MEMORY_LIMIT = int(os.environ.get("RESTORE_IN_MEMORY_LIMIT", 256 * 1024 * 1024))
+# Store file contents in the shared chunk store and archive only a manifest
+BACKUP_DEDUP = os.environ.get("BACKUP_DEDUP", "false").lower() == "true"
+
 class BackupManager:
     def __init__(self, backup_dir: Optional[str] = None):
         self.backup_dir = backup_dir or str(Path.home() / '.system_sync' / 'backups')
         self.storage = LocalStorage()
+        # In-memory index of backup records by id, filled from storage on miss
+        self._by_id: Dict[int, Dict] = {}
+        self._chunks: Optional[ChunkStore] = None
         os.makedirs(self.backup_dir, exist_ok=True)
 
-    async def create_backup(self, app_name: str, settings: List[Dict], callback=None) -> bool:
-        """Create a backup of application settings."""
+    @property
+    def chunks(self) -> ChunkStore:
+        """Chunk store for deduplicated backups, created on first use."""
+        if self._chunks is None:
+            self._chunks = ChunkStore()
+        return self._chunks
+
+    def _index_backups(self, backups: List[Dict], app_name: Optional[str] = None) -> None:
+        """Refresh the id index from a listing of all backups, or of app_name's backups.
+
+        Entries the listing covers but doesn't contain were deleted elsewhere and
+        are evicted; entries for other apps are left alone.
+        """
+        if app_name is None:
+            self._by_id = {}
+        else:
+            self._by_id = {backup_id: backup for backup_id, backup in self._by_id.items()
+                           if backup['app_name'] != app_name}
+        self._by_id.update((backup['id'], backup) for backup in backups)
+
+    async def get_backup(self, backup_id: int) -> Optional[Dict]:
+        """Get a single backup record by id."""
+        if backup_id not in self._by_id:
+            backup = await self.storage.get_backup(backup_id)
+            if not backup:
+                return None
+            self._by_id[backup_id] = backup
+        return self._by_id[backup_id]
+
+    @staticmethod
+    def _threadsafe_callback(callback):
+        """Wrap a progress callback so calls from worker threads run on the current event loop."""
+        if callback is None:
+            return None
+        loop = asyncio.get_running_loop()
+        return lambda progress: loop.call_soon_threadsafe(callback, progress)
+
+    def _collect_entries(self, settings: List[Dict]) -> Tuple[List[Dict], List[List[Tuple[str, Optional[str], int]]]]:
+        """Walk each setting once, collecting (source, relative path, size) entries.
+
+        Existence is established by opening the setting itself, so missing or
+        unreadable paths are skipped without a separate stat. Returns the
+        settings that exist alongside their entries.
+        """
+        valid_settings = []
+        setting_entries = []
+        for setting in settings:
+            setting_path = setting['path']
+            try:
+                entries = [
+                    (entry.path, os.path.relpath(entry.path, setting_path), entry.stat(follow_symlinks=True).st_size)
+                    for entry in scandir_walk(setting_path)
+                ]
+            except NotADirectoryError:
+                entries = [(setting_path, None, os.path.getsize(setting_path))]
+            except (FileNotFoundError, PermissionError):
+                continue
+            setting['size'] = sum(size for _, _, size in entries)  # Store size in setting metadata
+            valid_settings.append(setting)
+            setting_entries.append(entries)
+        return valid_settings, setting_entries
+
+    def _write_archive(self, valid_settings: List[Dict], setting_entries: List[List[Tuple[str, Optional[str], int]]],
+                       backup_path: str, compression: int, compresslevel: Optional[int],
+                       callback=None, dedup: bool = False) -> Tuple[int, int]:
+        """Write walked settings into a backup archive.
+
+        With dedup, file contents go to the chunk store and the archive holds
+        only a manifest of their chunk hashes.
+
+        Runs synchronously; returns the number of files archived and their total size.
+        """
+        total_size = sum(setting['size'] for setting in valid_settings)
+        logger.info(f"Total size to backup: {total_size} bytes")
+        
+        # Write source files straight into the archive; zipfile streams each one in chunks
+        logger.info("Creating zip archive")
+        processed_files = 0
+        written_bytes = 0
+        reported_bytes = 0
+        reported_files = 0
+        manifest = {}
+        with zipfile.ZipFile(backup_path, 'w', compression, compresslevel=compresslevel) as zipf:
+            for setting, entries in zip(valid_settings, setting_entries):
+                setting_path = setting['path']
+                arc_root = f"{setting['type']}/{os.path.basename(setting_path)}"
+                logger.info(f"Adding {setting_path} to archive as {arc_root}")
+                for src_file, rel_path, size in entries:
+                    arcname = arc_root if rel_path is None else f"{arc_root}/{rel_path.replace(os.sep, '/')}"
+                    try:
+                        if dedup:
+                            manifest[arcname] = self.chunks.put_file(src_file)
+                        else:
+                            zipf.write(src_file, arcname)
+                    except Exception as e:
+                        logger.warning(f"Error adding {src_file}: {str(e)}")
+                        continue
+                    processed_files += 1
+                    written_bytes += size
+                    # Report progress every PROGRESS_EVERY_FILES files or PROGRESS_EVERY_BYTES bytes
+                    if callback and total_size and (
+                        processed_files - reported_files >= PROGRESS_EVERY_FILES
+                        or written_bytes - reported_bytes >= PROGRESS_EVERY_BYTES
+                    ):
+                        callback(written_bytes / total_size * 75)  # First 75% for archiving, by bytes
+                        reported_files = processed_files
+                        reported_bytes = written_bytes
+
+            if dedup:
+                zipf.writestr(MANIFEST_NAME, json.dumps({'files': manifest}))
+
+        return processed_files, total_size
+
+    async def create_backup(self, app_name: str, settings: List[Dict], callback=None,
+                          compression: int = BACKUP_COMPRESSION,
+                          compresslevel: Optional[int] = BACKUP_COMPRESSION_LEVEL,
+                          dedup: bool = BACKUP_DEDUP) -> bool:
+        """Create a backup of application settings.
+
+        compression and compresslevel are passed to zipfile.ZipFile; use
+        zipfile.ZIP_STORED to skip compression, or zipfile.ZIP_ZSTANDARD on
+        Python 3.14+. With dedup, file contents are stored once in the chunk
+        store across backups and the archive holds only a manifest.
+        """
+        backup_path = None
+        chunks_lock = None
         try:
             logger.info(f"Starting backup creation for {app_name}")
             logger.info(f"Settings to backup: {settings}")
             
-            # Filter out non-existent paths
-            valid_settings = [
-                setting for setting in settings 
-                if os.path.exists(setting['path'])
-            ]
+            # Walk the settings on a worker thread, dropping paths that don't exist
+            valid_settings, setting_entries = await asyncio.to_thread(self._collect_entries, settings)
             
             if not valid_settings:
                 logger.warning("No valid settings paths found to backup")
@@ -36,73 +177,31 @@ class BackupManager:
                 
             logger.info(f"Valid settings to backup: {valid_settings}")
             
-            # Calculate total size before backup
-            total_size = 0
-            for setting in valid_settings:
-                setting_path = setting['path']
-                if os.path.isfile(setting_path):
-                    total_size += os.path.getsize(setting_path)
-                else:
-                    total_size += sum(f.stat().st_size for f in Path(setting_path).rglob('*') if f.is_file())
-                setting['size'] = total_size  # Store size in setting metadata
-            
-            logger.info(f"Total size to backup: {total_size} bytes")
-            
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             backup_path = os.path.join(self.backup_dir, f"{app_name}_{timestamp}.zip")
             logger.info(f"Backup will be stored at: {backup_path}")
-            
-            # Create a temporary directory for collecting files
-            with tempfile.TemporaryDirectory() as temp_dir:
-                logger.info(f"Created temporary directory: {temp_dir}")
-                total_files = sum(1 for setting in valid_settings for _ in Path(setting['path']).rglob('*') if _.is_file())
-                logger.info(f"Total files to backup: {total_files}")
-                processed_files = 0
-                
-                # Copy files to temporary directory
-                for setting in valid_settings:
-                    setting_path = setting['path']
-                    logger.info(f"Processing setting path: {setting_path}")
 
-                    relative_path = os.path.join(temp_dir, setting['type'], os.path.basename(setting_path))
-                    logger.info(f"Copying to relative path: {relative_path}")
-                    
-                    try:
-                        if os.path.isfile(setting_path):
-                            os.makedirs(os.path.dirname(relative_path), exist_ok=True)
-                            shutil.copy2(setting_path, relative_path)
-                            processed_files += 1
-                            if callback:
-                                callback(processed_files / total_files * 50)  # First 50% for copying
-                        else:
-                            for root, _, files in os.walk(setting_path):
-                                for file in files:
-                                    src_file = os.path.join(root, file)
-                                    rel_path = os.path.relpath(src_file, setting_path)
-                                    dst_file = os.path.join(relative_path, rel_path)
-                                    os.makedirs(os.path.dirname(dst_file), exist_ok=True)
-                                    shutil.copy2(src_file, dst_file)
-                                    processed_files += 1
-                                    if callback:
-                                        callback(processed_files / total_files * 50)
-                    except Exception as e:
-                        logger.warning(f"Error copying {setting_path}: {str(e)}")
-                        continue
-
-                logger.info(f"Processed {processed_files} files")
+            # Keep garbage collection away from new chunks until the backup is recorded
+            if dedup:
+                chunks_lock = await asyncio.to_thread(self.chunks.lock_shared)
+            
+            # Archive on a worker thread so the event loop stays responsive
+            processed_files, total_size = await asyncio.to_thread(
+                self._write_archive,
+                valid_settings,
+                setting_entries,
+                backup_path,
+                compression,
+                compresslevel,
+                self._threadsafe_callback(callback),
+                dedup
+            )
 
-                if processed_files == 0:
-                    logger.warning("No files were processed")
-                    return False
+            logger.info(f"Processed {processed_files} files")
 
-                # Create zip archive
-                logger.info("Creating zip archive")
-                with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for root, _, files in os.walk(temp_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, temp_dir)
-                            zipf.write(file_path, arcname)
+            if processed_files == 0:
+                logger.warning("No files were processed")
+                return False
 
             if callback:
                 callback(75)  # 75% after creating zip
@@ -113,14 +212,15 @@ class BackupManager:
                 'timestamp': timestamp,
                 'settings': valid_settings,  # Now includes accurate sizes
                 'app_name': app_name,
-                'total_size': total_size
+                'total_size': total_size,
+                'dedup': dedup
             }
             
+            # total_size is the uncompressed size, so it can't be checked against the archive
             storage_path = await self.storage.upload_backup(
                 app_name,
                 backup_path,
-                metadata,
-                total_size  # Pass total size to storage
+                metadata
             )
             
             if not storage_path:
@@ -138,123 +238,169 @@ class BackupManager:
             logger.exception("Full error details:")
             return False
         finally:
+            if chunks_lock:
+                chunks_lock.close()
             # Clean up local backup file
-            if os.path.exists(backup_path):
+            if backup_path and os.path.exists(backup_path):
                 os.remove(backup_path)
                 logger.info("Cleaned up temporary backup file")
 
+    @staticmethod
+    def _member_destination(name: str, targets: Dict[str, str]) -> Optional[str]:
+        """Map an archive member to its restore location, or None if it isn't being restored."""
+        for arc_root, setting_path in targets.items():
+            if name == arc_root:
+                return setting_path
+            if name.startswith(arc_root + '/'):
+                destination = os.path.normpath(os.path.join(setting_path, name[len(arc_root) + 1:]))
+                # Never write outside the setting's own directory
+                if destination.startswith(os.path.normpath(setting_path) + os.sep):
+                    return destination
+                return None
+        return None
+
+    def _restore_files(self, archive: Union[str, BinaryIO], settings: List[Dict],
+                       selected_files: Optional[List[str]] = None, callback=None) -> bool:
+        """Stream a backup archive's members straight to their settings paths.
+
+        archive is a path to the downloaded backup or a file object holding it.
+
+        Runs synchronously; returns False if the archive couldn't be read.
+        """
+        try:
+            with zipfile.ZipFile(archive, 'r') as zipf:
+                # Deduplicated backups list their files, as chunk hashes, in a manifest
+                manifest = read_manifest(zipf)
+                if manifest is None:
+                    members = [(info.filename, info) for info in zipf.infolist() if not info.is_dir()]
+                else:
+                    members = list(manifest.items())
+
+                # Members live under <type>/<basename of the setting path>; archives
+                # without that level keep the setting's contents directly under <type>
+                targets = {}
+                for setting in settings:
+                    setting_path = setting['path']
+                    if selected_files and setting_path not in selected_files:
+                        logger.info(f"Skipping {setting_path} (not selected)")
+                        continue
+                    arc_root = f"{setting['type']}/{os.path.basename(setting_path)}"
+                    if not any(name == arc_root or name.startswith(arc_root + '/') for name, _ in members):
+                        arc_root = setting['type']
+                    targets[arc_root] = setting_path
+
+                restores = []
+                for name, source in members:
+                    destination = self._member_destination(name, targets)
+                    if destination:
+                        restores.append((source, destination))
+
+                # Create destination directories once before writing, shallowest first
+                parents = {os.path.dirname(destination) for _, destination in restores}
+                for parent in sorted(parents, key=lambda p: p.count(os.sep)):
+                    os.makedirs(parent, exist_ok=True)
+
+                for i, (source, destination) in enumerate(restores, 1):
+                    try:
+                        with open(destination, 'wb') as dst:
+                            if manifest is None:
+                                with zipf.open(source) as src:
+                                    shutil.copyfileobj(src, dst, RESTORE_CHUNK_SIZE)
+                            else:
+                                self.chunks.write_to(source, dst)
+                    except Exception as e:
+                        logger.error(f"Error restoring {destination}: {str(e)}")
+
+                    if callback:
+                        callback(25 + (i / len(restores) * 75))  # Last 75% for restoring
+
+                logger.info(f"Restored {len(restores)} files")
+        except (zipfile.BadZipFile, OSError, KeyError, ValueError) as e:
+            logger.error(f"Error reading backup: {str(e)}")
+            return False
+
+        return True
+
     async def restore_backup(self, backup_id: int, selected_files: Optional[List[str]] = None, callback=None) -> bool:
         """Restore application settings from backup."""
+        temp_path = None
         try:
             # Get backup information
-            backups = await self.storage.list_backups()
-            backup_info = next((b for b in backups if b['id'] == backup_id), None)
+            backup_info = await self.get_backup(backup_id)
             
             if not backup_info:
                 logger.error(f"Backup with ID {backup_id} not found")
                 return False
 
             logger.info(f"Starting restore of backup ID {backup_id}: {backup_info['filename']}")
+            # Backups stored before content hashing was added have no sha256 and are not verified
+            expected_sha256 = backup_info['metadata'].get('sha256')
 
-            # Create temporary file for downloaded backup
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
-                temp_path = temp_file.name
+            if backup_info['size'] <= RESTORE_IN_MEMORY_LIMIT:
+                # Typical settings backups are small enough to read straight into memory
+                logger.info(f"Reading backup from {backup_info['storage_path']} into memory")
+                data = await self.storage.read_backup(backup_info['storage_path'], expected_sha256)
+                if data is None:
+                    logger.error("Failed to read backup file")
+                    return False
+                archive = io.BytesIO(data)
+            else:
+                # Get a scratch file for the downloaded backup
+                temp_path = scratch_files.acquire()
 
-            # Download backup
-            logger.info(f"Downloading backup from {backup_info['storage_path']} to {temp_path}")
-            success = await self.storage.download_backup(
-                backup_info['storage_path'],
-                temp_path
-            )
-            
-            if not success:
-                logger.error("Failed to download backup file")
-                return False
+                # Download backup
+                logger.info(f"Downloading backup from {backup_info['storage_path']} to {temp_path}")
+                success = await self.storage.download_backup(
+                    backup_info['storage_path'],
+                    temp_path,
+                    expected_sha256=expected_sha256
+                )
+                
+                if not success:
+                    logger.error("Failed to download backup file")
+                    return False
+                archive = temp_path
 
             if callback:
                 callback(25)  # 25% after download
 
-            # Create temporary directory for extraction
-            with tempfile.TemporaryDirectory() as extract_dir:
-                # Extract backup
-                logger.info(f"Extracting backup to {extract_dir}")
-                try:
-                    with zipfile.ZipFile(temp_path, 'r') as zipf:
-                        zipf.extractall(extract_dir)
-                except Exception as e:
-                    logger.error(f"Error extracting backup: {str(e)}")
-                    return False
-
-                if callback:
-                    callback(50)  # 50% after extraction
-
-                # List extracted contents for debugging
-                logger.info("Extracted contents:")
-                for root, dirs, files in os.walk(extract_dir):
-                    for d in dirs:
-                        logger.info(f"Directory: {os.path.join(root, d)}")
-                    for f in files:
-                        logger.info(f"File: {os.path.join(root, f)}")
-
-                # Restore files
-                settings = backup_info['metadata']['settings']
-                total_settings = len(settings)
-                
-                for i, setting in enumerate(settings, 1):
-                    setting_path = setting['path']
-                    setting_type = setting['type']
-                    
-                    # Skip if not in selected files (if specified)
-                    if selected_files and setting_path not in selected_files:
-                        logger.info(f"Skipping {setting_path} (not selected)")
-                        continue
-                    
-                    # Determine source path based on setting type
-                    # The directory structure in the backup is organized by setting type
-                    source_path = os.path.join(extract_dir, setting_type)
-                    
-                    logger.info(f"Restoring {setting_type} from {source_path} to {setting_path}")
-                    
-                    try:
-                        if os.path.isfile(source_path):
-                            # Ensure target directory exists
-                            os.makedirs(os.path.dirname(setting_path), exist_ok=True)
-                            shutil.copy2(source_path, setting_path)
-                            logger.info(f"Restored file: {setting_path}")
-                        elif os.path.isdir(source_path):
-                            # Copy directory recursively
-                            shutil.copytree(source_path, setting_path, dirs_exist_ok=True)
-                            logger.info(f"Restored directory: {setting_path}")
-                        else:
-                            logger.warning(f"Source path not found: {source_path}")
-                    except Exception as e:
-                        logger.error(f"Error restoring {setting_path}: {str(e)}")
-
-                    if callback:
-                        callback(50 + (i / total_settings * 50))  # Last 50% for restoring
+            # Extract and copy files on a worker thread so the event loop stays responsive
+            restored = await asyncio.to_thread(
+                self._restore_files,
+                archive,
+                backup_info['metadata']['settings'],
+                selected_files,
+                self._threadsafe_callback(callback)
+            )
+            if not restored:
+                return False
 
-                # Update backup record
-                try:
-                    await self.storage.update_backup_restored(backup_id)
-                    logger.info(f"Updated backup {backup_id} as restored")
-                except Exception as e:
-                    logger.error(f"Error updating backup restored status: {str(e)}")
+            # Update backup record; the indexed copy is stale either way
+            self._by_id.pop(backup_id, None)
+            try:
+                await self.storage.update_backup_restored(backup_id)
+                logger.info(f"Updated backup {backup_id} as restored")
+            except Exception as e:
+                logger.error(f"Error updating backup restored status: {str(e)}")
 
-                # Cleanup
-                os.remove(temp_path)
-                logger.info("Restore completed successfully")
+            logger.info("Restore completed successfully")
 
-                return True
+            return True
 
         except Exception as e:
             logger.error(f"Error restoring backup: {str(e)}")
             logger.exception("Full error details:")
             return False
+        finally:
+            # Cleanup
+            if temp_path:
+                scratch_files.release(temp_path)
 
     async def list_backups(self, app_name: Optional[str] = None) -> Dict:
         """List available backups."""
         try:
             backups = await self.storage.list_backups(app_name)
+            self._index_backups(backups, app_name)
             
             # Organize backups by app name
             organized = {}
@@ -278,10 +424,63 @@ class BackupManager:
             logger.error(f"Error listing backups: {str(e)}")
             return {}
 
+    async def export_backup(self, backup_info: Dict, destination: str) -> bool:
+        """Write a backup as a self-contained zip, rebuilding the files of a deduplicated one."""
+        try:
+            if backup_info['metadata'].get('dedup'):
+                await asyncio.to_thread(self.chunks.rebuild_archive, backup_info['storage_path'], destination)
+                return True
+            return await self.storage.download_backup(backup_info['storage_path'], destination)
+        except Exception as e:
+            logger.error(f"Error exporting backup: {str(e)}")
+            return False
+
+    def _collect_chunks(self, backups: List[Dict]) -> int:
+        """Remove chunks that no remaining deduplicated backup references.
+
+        Runs synchronously; returns the number of chunks removed.
+        """
+        referenced = set()
+        for backup in backups:
+            if backup['metadata'].get('dedup'):
+                with zipfile.ZipFile(backup['storage_path'], 'r') as zipf:
+                    for digests in read_manifest(zipf).values():
+                        referenced.update(digests)
+        return self.chunks.collect_garbage(referenced)
+
     async def delete_backup(self, backup_id: int) -> bool:
-        """Delete a backup."""
+        """Delete a backup, reclaiming the chunks only it used if it was deduplicated."""
         try:
-            return await self.storage.delete_backup(backup_id)
+            backup_info = await self.get_backup(backup_id)
+            self._by_id.pop(backup_id, None)
+            if not await self.storage.delete_backup(backup_id):
+                return False
+            if backup_info and backup_info['metadata'].get('dedup'):
+                try:
+                    await asyncio.to_thread(self._collect_chunks, await self.storage.list_backups())
+                except Exception as e:
+                    logger.error(f"Error collecting unreferenced chunks: {str(e)}")
+            return True
         except Exception as e:
             logger.error(f"Error deleting backup: {str(e)}")
-            return False 
\ No newline at end of file
+            return False 
+
+
+def run_backup_process(app_name: str, settings: List[Dict], progress_queue) -> bool:
+    """Run a backup inside a worker process, reporting progress through a queue.
+
+    Progress is sent as (app_name, progress, status) tuples so the parent
+    process can forward them to its progress store.
+    """
+    success = False
+    try:
+        manager = BackupManager()
+        success = asyncio.run(manager.create_backup(
+            app_name,
+            settings,
+            lambda p: progress_queue.put((app_name, p, "in-progress"))
+        ))
+    finally:
+        # Always report a final status, so a failed worker doesn't leave the job in progress
+        progress_queue.put((app_name, 100 if success else 0, "completed" if success else "failed"))
+    return success
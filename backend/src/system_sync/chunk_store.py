@@ -0,0 +1,130 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Dict, IO, Iterable, List, Optional, Set
+from fastcdc import fastcdc
+
+try:
+    import fcntl
+except ImportError:  # Windows, where unreferenced chunks aren't collected
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Content-defined chunk sizes; boundaries land on average every CHUNK_AVG_SIZE bytes
+CHUNK_MIN_SIZE = 16 * 1024
+CHUNK_AVG_SIZE = 64 * 1024
+CHUNK_MAX_SIZE = 256 * 1024
+
+# Archive member mapping arcnames to chunk hashes in deduplicated backups
+MANIFEST_NAME = 'manifest.json'
+
+def read_manifest(zf: zipfile.ZipFile) -> Optional[Dict[str, List[str]]]:
+    """Get the arcname -> chunk hashes map of a deduplicated backup, or None for a regular one."""
+    try:
+        with zf.open(MANIFEST_NAME) as f:
+            return json.load(f)['files']
+    except KeyError:
+        return None
+
+class ChunkStore:
+    """Content-addressed store of file chunks shared by deduplicated backups.
+
+    Chunks live at <root>/<sha256[:2]>/<sha256>, so a chunk seen in any
+    earlier backup is never written again. Backups being written hold a
+    shared lock on the store; collect_garbage only runs while it can take
+    the lock exclusively, so it never removes chunks a new backup is using.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or str(Path.home() / '.system_sync' / 'chunks')
+        os.makedirs(self.root, exist_ok=True)
+
+    def _chunk_path(self, digest: str) -> str:
+        """Get the storage path for a chunk."""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def lock_shared(self) -> IO:
+        """Take a shared lock on the store, held until the returned file is closed."""
+        lock = open(os.path.join(self.root, '.lock'), 'a')
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+        return lock
+
+    def put(self, data: bytes) -> str:
+        """Store a chunk if it isn't already present and return its hash."""
+        digest = hashlib.sha256(data).hexdigest()
+        chunk_path = self._chunk_path(digest)
+        if not os.path.exists(chunk_path):
+            os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+            # Write to a temporary name first so a partial chunk is never visible
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(chunk_path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, chunk_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        return digest
+
+    def put_file(self, path: str) -> List[str]:
+        """Chunk a file into the store, returning its ordered list of chunk hashes."""
+        if os.path.getsize(path) == 0:
+            return []
+        return [
+            self.put(chunk.data)
+            for chunk in fastcdc(path, CHUNK_MIN_SIZE, CHUNK_AVG_SIZE, CHUNK_MAX_SIZE, fat=True)
+        ]
+
+    def write_to(self, digests: Iterable[str], dst: BinaryIO) -> None:
+        """Write the file made of the given chunks to an open file."""
+        for digest in digests:
+            with open(self._chunk_path(digest), 'rb') as src:
+                shutil.copyfileobj(src, dst)
+
+    def rebuild_archive(self, manifest_zip: str, dst_zip: str,
+                        compression: int = zipfile.ZIP_DEFLATED, compresslevel: Optional[int] = 1) -> None:
+        """Write a self-contained zip holding the real files of a deduplicated backup."""
+        with zipfile.ZipFile(manifest_zip, 'r') as src:
+            manifest = read_manifest(src)
+        if manifest is None:
+            raise ValueError(f"{manifest_zip} is not a deduplicated backup")
+        with zipfile.ZipFile(dst_zip, 'w', compression, compresslevel=compresslevel) as dst:
+            for arcname, digests in manifest.items():
+                with dst.open(arcname, 'w', force_zip64=True) as f:
+                    self.write_to(digests, f)
+
+    def collect_garbage(self, referenced: Set[str]) -> int:
+        """Remove chunks not in referenced, returning how many were removed.
+
+        Skipped, returning 0, while any backup holds the shared lock; the
+        chunks are collected by a later call instead.
+        """
+        if fcntl is None:
+            return 0
+        removed = 0
+        with open(os.path.join(self.root, '.lock'), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info("Chunk store in use, deferring garbage collection")
+                return 0
+            with os.scandir(self.root) as prefixes:
+                for prefix in prefixes:
+                    if not prefix.is_dir() or len(prefix.name) != 2:
+                        continue
+                    with os.scandir(prefix.path) as chunks:
+                        for chunk in chunks:
+                            # Also clears temporary files left by interrupted writes
+                            if chunk.name not in referenced:
+                                os.remove(chunk.path)
+                                removed += 1
+        logger.info(f"Removed {removed} unreferenced chunks")
+        return removed
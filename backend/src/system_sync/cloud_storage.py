@@ -1,27 +1,91 @@
 import os
+import asyncio
 from typing import Optional, Dict, List
 from datetime import datetime
 import logging
-from supabase_client import supabase, BACKUPS_TABLE, BACKUP_FILES_TABLE
+from supabase_client import (
+    get_client, get_s3_config, BACKUPS_TABLE, BACKUP_FILES_TABLE
+)
 from pathlib import Path
 
+try:
+    from aiobotocore.session import get_session
+except ImportError:  # Multipart uploads need aiobotocore; fall back to a single upload
+    get_session = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Multipart upload tuning; at most UPLOAD_CONCURRENCY parts are held in memory at once
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+UPLOAD_CONCURRENCY = int(os.environ.get("CLOUD_UPLOAD_CONCURRENCY", 8))
+
+def _read_part(file_path: str, offset: int, size: int) -> bytes:
+    """Read one upload part from a file."""
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
 class CloudStorage:
     def __init__(self):
         self.bucket_name = 'app-backups'
+        # Storage usage per user as (backup_count, latest created_at, usage dict)
+        self._usage_cache: Dict[str, tuple] = {}
         self._init_storage()
 
     def _init_storage(self):
         """Initialize Supabase storage bucket."""
         try:
             # Create bucket if it doesn't exist
-            supabase.storage.create_bucket(self.bucket_name, {'public': False})
+            get_client().storage.create_bucket(self.bucket_name, {'public': False})
         except Exception as e:
             # Bucket might already exist
             logger.info(f"Bucket initialization: {str(e)}")
 
+    def _multipart_enabled(self, file_size: int) -> bool:
+        """Check whether a file should go through the S3 multipart upload path."""
+        return (
+            get_session is not None
+            and file_size > UPLOAD_PART_SIZE
+            and get_s3_config() is not None
+        )
+
+    async def _multipart_upload(self, file_path: str, storage_path: str, file_size: int) -> None:
+        """Upload a file through Supabase's S3-compatible endpoint in concurrent parts."""
+        session = get_session()
+        async with session.create_client('s3', **get_s3_config()) as s3:
+            upload = await s3.create_multipart_upload(Bucket=self.bucket_name, Key=storage_path)
+            upload_id = upload['UploadId']
+            semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+            async def upload_part(part_number: int, offset: int) -> Dict:
+                async with semaphore:
+                    size = min(UPLOAD_PART_SIZE, file_size - offset)
+                    body = await asyncio.to_thread(_read_part, file_path, offset, size)
+                    part = await s3.upload_part(
+                        Bucket=self.bucket_name,
+                        Key=storage_path,
+                        UploadId=upload_id,
+                        PartNumber=part_number,
+                        Body=body
+                    )
+                    return {'PartNumber': part_number, 'ETag': part['ETag']}
+
+            try:
+                parts = await asyncio.gather(*(
+                    upload_part(part_number, offset)
+                    for part_number, offset in enumerate(range(0, file_size, UPLOAD_PART_SIZE), 1)
+                ))
+                await s3.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=storage_path,
+                    UploadId=upload_id,
+                    MultipartUpload={'Parts': parts}
+                )
+            except Exception:
+                await s3.abort_multipart_upload(Bucket=self.bucket_name, Key=storage_path, UploadId=upload_id)
+                raise
+
     async def upload_backup(self, 
                           user_id: str,
                           app_name: str, 
@@ -34,12 +98,15 @@ class CloudStorage:
             file_size = os.path.getsize(file_path)
             
             # Upload file to Supabase Storage
-            with open(file_path, 'rb') as f:
-                storage_path = f"{user_id}/{app_name}/{file_name}"
-                supabase.storage.from_(self.bucket_name).upload(
-                    storage_path,
-                    f
-                )
+            storage_path = f"{user_id}/{app_name}/{file_name}"
+            if self._multipart_enabled(file_size):
+                await self._multipart_upload(file_path, storage_path, file_size)
+            else:
+                with open(file_path, 'rb') as f:
+                    get_client().storage.from_(self.bucket_name).upload(
+                        storage_path,
+                        f
+                    )
 
             # Create backup record in database
             backup_data = {
@@ -52,7 +119,8 @@ class CloudStorage:
                 'metadata': metadata
             }
 
-            result = supabase.table(BACKUPS_TABLE).insert(backup_data).execute()
+            result = get_client().table(BACKUPS_TABLE).insert(backup_data).execute()
+            self._usage_cache.pop(user_id, None)
             
             if result.data:
                 return storage_path
@@ -70,7 +138,7 @@ class CloudStorage:
         """Download backup from Supabase Storage."""
         try:
             # Download file from Supabase Storage
-            data = supabase.storage.from_(self.bucket_name).download(storage_path)
+            data = get_client().storage.from_(self.bucket_name).download(storage_path)
             
             # Ensure destination directory exists
             os.makedirs(os.path.dirname(destination), exist_ok=True)
@@ -88,7 +156,7 @@ class CloudStorage:
     async def list_backups(self, user_id: str, app_name: Optional[str] = None) -> List[Dict]:
         """List available backups for a user."""
         try:
-            query = supabase.table(BACKUPS_TABLE).select('*').eq('user_id', user_id)
+            query = get_client().table(BACKUPS_TABLE).select('*').eq('user_id', user_id)
             
             if app_name:
                 query = query.eq('app_name', app_name)
@@ -104,14 +172,15 @@ class CloudStorage:
         """Delete backup from Supabase Storage and database."""
         try:
             # Delete from storage
-            supabase.storage.from_(self.bucket_name).remove([storage_path])
+            get_client().storage.from_(self.bucket_name).remove([storage_path])
             
             # Delete from database
-            supabase.table(BACKUPS_TABLE)\
+            get_client().table(BACKUPS_TABLE)\
                 .delete()\
                 .eq('user_id', user_id)\
                 .eq('storage_path', storage_path)\
                 .execute()
+            self._usage_cache.pop(user_id, None)
                 
             return True
 
@@ -119,22 +188,49 @@ class CloudStorage:
             logger.error(f"Error deleting backup: {str(e)}")
             return False
 
-    async def get_user_storage_usage(self, user_id: str) -> Dict:
-        """Get storage usage statistics for a user."""
+    def _sum_storage_usage(self, user_id: str) -> Dict:
+        """Aggregate a user's backup sizes, in the database where PostgREST aggregates are enabled."""
         try:
-            result = supabase.table(BACKUPS_TABLE)\
+            result = get_client().table(BACKUPS_TABLE)\
+                .select('total_size:size.sum(),backup_count:count()')\
+                .eq('user_id', user_id)\
+                .execute()
+            row = result.data[0] if result.data else {}
+            return {
+                'total_size': row.get('total_size') or 0,
+                'backup_count': row.get('backup_count') or 0
+            }
+        except Exception as e:
+            logger.info(f"Aggregate query unavailable, summing rows: {str(e)}")
+            result = get_client().table(BACKUPS_TABLE)\
                 .select('size')\
                 .eq('user_id', user_id)\
                 .execute()
-                
-            total_size = sum(row['size'] for row in result.data)
-            backup_count = len(result.data)
-            
             return {
-                'total_size': total_size,
-                'backup_count': backup_count
+                'total_size': sum(row['size'] for row in result.data),
+                'backup_count': len(result.data)
             }
 
+    async def get_user_storage_usage(self, user_id: str) -> Dict:
+        """Get storage usage statistics for a user."""
+        try:
+            # Cheap check of count and newest backup before redoing the aggregate
+            latest = get_client().table(BACKUPS_TABLE)\
+                .select('created_at', count='exact')\
+                .eq('user_id', user_id)\
+                .order('created_at', desc=True)\
+                .limit(1)\
+                .execute()
+            latest_created_at = latest.data[0]['created_at'] if latest.data else None
+
+            cached = self._usage_cache.get(user_id)
+            if cached and cached[0] == latest.count and cached[1] == latest_created_at:
+                return dict(cached[2])
+
+            usage = self._sum_storage_usage(user_id)
+            self._usage_cache[user_id] = (latest.count, latest_created_at, usage)
+            return dict(usage)
+
         except Exception as e:
             logger.error(f"Error getting storage usage: {str(e)}")
-            return {'total_size': 0, 'backup_count': 0} 
\ No newline at end of file
+            return {'total_size': 0, 'backup_count': 0}
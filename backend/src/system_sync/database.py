@@ -1,13 +1,172 @@
 import sqlite3
 import os
+import asyncio
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        """Serialize a settings/metadata value to a BLOB."""
+        return orjson.dumps(obj)
+
+    _loads = orjson.loads
+except ImportError:  # Fall back to the standard library parser
+    def _dumps(obj) -> bytes:
+        """Serialize a settings/metadata value to a BLOB."""
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    _loads = json.loads
+
+# Schema version stored in PRAGMA user_version; 1 stores settings/metadata as BLOBs
+SCHEMA_VERSION = 1
+
+# Prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+# Bytes of the database file to memory-map for reads
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Queued single-row writes are coalesced into one transaction per flush
+WRITE_FLUSH_INTERVAL = 0.02
+WRITE_BATCH_SIZE = 256
+
+# SQL statements, kept at module level so each call reuses the connection's cached statement
+_SQL_CREATE_APPLICATIONS = '''
+    CREATE TABLE IF NOT EXISTS applications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        path TEXT NOT NULL,
+        category TEXT NOT NULL,
+        type TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        settings BLOB,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(path)
+    )
+'''
+
+_SQL_CREATE_BACKUPS = '''
+    CREATE TABLE IF NOT EXISTS backups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        app_id INTEGER NOT NULL,
+        filename TEXT NOT NULL,
+        storage_path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        metadata BLOB,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        restored_at TIMESTAMP,
+        FOREIGN KEY (app_id) REFERENCES applications(id),
+        UNIQUE(storage_path)
+    )
+'''
+
+# Indices for the backup listing (filtered by app, newest first) and app lookups
+_SQL_CREATE_INDICES = (
+    'CREATE INDEX IF NOT EXISTS idx_backups_app_created ON backups(app_id, created_at DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_apps_name ON applications(name)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_backups_storage_path ON backups(storage_path)',
+)
+
+# Rewrite JSON stored as TEXT by older versions as BLOBs; the bytes are unchanged
+_SQL_MIGRATE_TO_BLOBS = (
+    "UPDATE applications SET settings = CAST(settings AS BLOB) WHERE typeof(settings) = 'text'",
+    "UPDATE backups SET metadata = CAST(metadata AS BLOB) WHERE typeof(metadata) = 'text'",
+)
+
+_SQL_GET_APPLICATIONS = 'SELECT * FROM applications ORDER BY name'
+
+# Insert or refresh an application keyed on its path, returning the stored row (SQLite >= 3.35)
+_SQL_UPSERT_APP = '''
+    INSERT INTO applications (name, path, category, type, size, settings)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(path) DO UPDATE SET
+        category = excluded.category,
+        type = excluded.type,
+        size = excluded.size,
+        settings = excluded.settings,
+        updated_at = CURRENT_TIMESTAMP
+    RETURNING *
+'''
+
+_SQL_GET_BACKUPS_BY_APP = '''
+    SELECT b.*, a.name as app_name
+    FROM backups b
+    JOIN applications a ON b.app_id = a.id
+    WHERE app_id = ?
+    ORDER BY created_at DESC
+'''
+
+_SQL_GET_BACKUPS = '''
+    SELECT b.*, a.name as app_name
+    FROM backups b
+    JOIN applications a ON b.app_id = a.id
+    ORDER BY created_at DESC
+'''
+
+_SQL_GET_BACKUP = '''
+    SELECT b.*, a.name as app_name
+    FROM backups b
+    JOIN applications a ON b.app_id = a.id
+    WHERE b.id = ?
+    LIMIT 1
+'''
+
+_SQL_GET_BACKUP_PATH = 'SELECT storage_path FROM backups WHERE id = ?'
+
+_SQL_STORAGE_STATS = 'SELECT COALESCE(SUM(size), 0) AS total_size, COUNT(*) AS backup_count FROM backups'
+
+_SQL_INSERT_BACKUP = '''
+    INSERT INTO backups (app_id, filename, storage_path, size, metadata)
+    VALUES (:app_id, :filename, :storage_path, :size, :metadata)
+'''
+
+# Single-row insert that returns the stored row; callers attach app_name themselves
+_SQL_INSERT_BACKUP_RETURNING = '''
+    INSERT INTO backups (app_id, filename, storage_path, size, metadata)
+    VALUES (:app_id, :filename, :storage_path, :size, :metadata)
+    RETURNING id, app_id, filename, storage_path, size, metadata, created_at, restored_at
+'''
+
+_SQL_MARK_RESTORED = '''
+    UPDATE backups
+    SET restored_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+
+_SQL_DELETE_BACKUP = 'DELETE FROM backups WHERE id = ?'
+
+# Writes accepted by Database.submit_write
+_WRITE_OPS = {
+    'mark_restored': _SQL_MARK_RESTORED,
+    'delete_backup': _SQL_DELETE_BACKUP,
+}
+
+def _fail_future(future: asyncio.Future, error: Exception) -> None:
+    """Fail a future unless it already has a result."""
+    if not future.done():
+        future.set_exception(error)
+
+def _fetchall_dicts(cursor: sqlite3.Cursor) -> List[Dict]:
+    """Fetch all rows as dicts, reading the column names once per query."""
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def _fetchone_dict(cursor: sqlite3.Cursor) -> Optional[Dict]:
+    """Fetch the next row as a dict, or None if there are no more rows."""
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([col[0] for col in cursor.description], row))
+
 class Database:
     def __init__(self, db_path: Optional[str] = None):
         """Initialize database connection."""
@@ -17,129 +176,139 @@ class Database:
             db_path = db_dir / 'system_sync.db'
         
         self.db_path = db_path
+        # One connection for the lifetime of the object; the lock serializes its use across threads
+        self._lock = threading.RLock()
+        self._conn = self._connect()
         self._init_db()
+        # Queue of pending writes, bound to the event loop that started the writer task
+        self._writer_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+
+    def close(self):
+        """Close the database connection, refreshing planner statistics first.
+
+        Queued writes that haven't been flushed are failed; use aclose from
+        the writer's event loop to flush them instead.
+        """
+        self._stop_writer(RuntimeError("Database closed"))
+        with self._lock:
+            # Re-analyzes only the tables whose statistics would change a query plan
+            self._conn.execute('PRAGMA optimize')
+            self._conn.close()
+
+    async def aclose(self):
+        """Flush queued writes, stop the writer task, then close the connection."""
+        task = self._writer_task
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            # The writer commits everything queued ahead of the stop item, then exits
+            await self._writer_queue.put(None)
+            await task
+        self.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with WAL journaling and tuned PRAGMAs."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-20000')
+        conn.execute('PRAGMA busy_timeout=5000')
+        conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+        return conn
 
     def _init_db(self):
         """Initialize database tables."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self._conn as conn:
             cursor = conn.cursor()
 
             # Create applications table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS applications (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    path TEXT NOT NULL,
-                    category TEXT NOT NULL,
-                    type TEXT NOT NULL,
-                    size INTEGER NOT NULL,
-                    settings TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(path)
-                )
-            ''')
+            cursor.execute(_SQL_CREATE_APPLICATIONS)
 
             # Create backups table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS backups (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    app_id INTEGER NOT NULL,
-                    filename TEXT NOT NULL,
-                    storage_path TEXT NOT NULL,
-                    size INTEGER NOT NULL,
-                    metadata TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    restored_at TIMESTAMP,
-                    FOREIGN KEY (app_id) REFERENCES applications(id),
-                    UNIQUE(storage_path)
-                )
-            ''')
+            cursor.execute(_SQL_CREATE_BACKUPS)
 
-            conn.commit()
+            # Create indices
+            for statement in _SQL_CREATE_INDICES:
+                cursor.execute(statement)
+
+            # Migrate rows written by older schema versions
+            cursor.execute('PRAGMA user_version')
+            if cursor.fetchone()[0] < SCHEMA_VERSION:
+                logger.info(f"Migrating database to schema version {SCHEMA_VERSION}")
+                for statement in _SQL_MIGRATE_TO_BLOBS:
+                    cursor.execute(statement)
+                cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+                # Give the query planner real row counts for the migrated tables;
+                # after that, PRAGMA optimize in close() keeps them current
+                cursor.execute('ANALYZE')
 
-    def dict_factory(self, cursor: sqlite3.Cursor, row: tuple) -> Dict:
-        """Convert SQL row to dictionary."""
-        d = {}
-        for idx, col in enumerate(cursor.description):
-            d[col[0]] = row[idx]
-        return d
+            conn.commit()
 
     def get_applications(self) -> List[Dict]:
         """Get all applications."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = self.dict_factory
+        with self._lock, self._conn as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM applications ORDER BY name')
-            apps = cursor.fetchall()
+            cursor.execute(_SQL_GET_APPLICATIONS)
+            apps = _fetchall_dicts(cursor)
             
             # Parse JSON settings
             for app in apps:
                 if app['settings']:
-                    app['settings'] = json.loads(app['settings'])
+                    app['settings'] = _loads(app['settings'])
             
             return apps
 
+    def _upsert_application(self, cursor: sqlite3.Cursor, app_data: Dict) -> Optional[Dict]:
+        """Insert or update an application on an open cursor and return the stored row."""
+        # Serialize settings to JSON bytes if present
+        if app_data.get('settings') is not None:
+            app_data['settings'] = _dumps(app_data['settings'])
+
+        # Insert or update in one statement and read back the stored row
+        cursor.execute(_SQL_UPSERT_APP, (
+            app_data['name'],
+            app_data['path'],
+            app_data['category'],
+            app_data['type'],
+            app_data['size'],
+            app_data['settings']
+        ))
+        app = _fetchone_dict(cursor)
+        
+        # Parse JSON settings in response
+        if app and app['settings']:
+            try:
+                app['settings'] = _loads(app['settings'])
+            except json.JSONDecodeError:
+                logger.warning("Failed to parse settings JSON, returning as string")
+        return app
+
+    def _insert_backup(self, cursor: sqlite3.Cursor, backup_data: Dict) -> Optional[Dict]:
+        """Insert a backup on an open cursor and return the stored row."""
+        # Serialize metadata to JSON bytes
+        if backup_data.get('metadata') is not None:
+            backup_data['metadata'] = _dumps(backup_data['metadata'])
+            logger.info("Serialized metadata")
+
+        logger.info("Inserting backup record")
+        cursor.execute(_SQL_INSERT_BACKUP_RETURNING, backup_data)
+        backup = _fetchone_dict(cursor)
+        
+        # Parse JSON metadata in response
+        if backup and backup['metadata']:
+            try:
+                backup['metadata'] = _loads(backup['metadata'])
+                logger.info("Successfully parsed backup metadata")
+            except json.JSONDecodeError as e:
+                logger.warning(f"Failed to parse backup metadata: {e}")
+        return backup
+
     def add_application(self, app_data: Dict) -> Optional[Dict]:
         """Add a new application."""
         try:
             logger.info(f"Adding application to database: {app_data}")
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = self.dict_factory
-                cursor = conn.cursor()
-                
-                # Convert settings to JSON string if present
-                if 'settings' in app_data and app_data['settings']:
-                    app_data['settings'] = json.dumps(app_data['settings'])
-
-                # Check if application already exists
-                cursor.execute('''
-                    SELECT * FROM applications 
-                    WHERE name = ? AND path = ?
-                ''', (app_data['name'], app_data['path']))
-                
-                existing_app = cursor.fetchone()
-                if existing_app:
-                    logger.info("Application already exists, updating record")
-                    cursor.execute('''
-                        UPDATE applications 
-                        SET category = ?, type = ?, size = ?, settings = ?, updated_at = CURRENT_TIMESTAMP
-                        WHERE name = ? AND path = ?
-                    ''', (
-                        app_data['category'],
-                        app_data['type'],
-                        app_data['size'],
-                        app_data['settings'],
-                        app_data['name'],
-                        app_data['path']
-                    ))
-                    app_id = existing_app['id']
-                else:
-                    logger.info("Creating new application record")
-                    cursor.execute('''
-                        INSERT INTO applications (name, path, category, type, size, settings)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        app_data['name'],
-                        app_data['path'],
-                        app_data['category'],
-                        app_data['type'],
-                        app_data['size'],
-                        app_data['settings']
-                    ))
-                    app_id = cursor.lastrowid
-
-                # Get the application record
-                cursor.execute('SELECT * FROM applications WHERE id = ?', (app_id,))
-                app = cursor.fetchone()
-                
-                # Parse JSON settings in response
-                if app and app['settings']:
-                    try:
-                        app['settings'] = json.loads(app['settings'])
-                    except json.JSONDecodeError:
-                        logger.warning("Failed to parse settings JSON, returning as string")
-                
+            with self._lock, self._conn as conn:
+                app = self._upsert_application(conn.cursor(), app_data)
                 logger.info(f"Successfully added/updated application: {app}")
                 return app
 
@@ -152,75 +321,91 @@ class Database:
             logger.exception("Full error details:")
             return None
 
+    def add_application_and_backup(self, app_data: Dict, backup_data: Dict) -> Optional[Dict]:
+        """Record an application and one of its backups in a single transaction.
+
+        backup_data's app_id is filled in from the application row. Returns the
+        backup row, or None with neither row written.
+        """
+        try:
+            logger.info(f"Adding application and backup to database: {app_data}, {backup_data}")
+            with self._lock, self._conn as conn:
+                cursor = conn.cursor()
+                app = self._upsert_application(cursor, app_data)
+                if not app:
+                    raise sqlite3.DatabaseError("Application upsert returned no row")
+                backup_data['app_id'] = app['id']
+                backup = self._insert_backup(cursor, backup_data)
+                logger.info(f"Successfully created backup record: {backup}")
+                return backup
+
+        except sqlite3.IntegrityError as e:
+            logger.error(f"Database integrity error while adding backup: {str(e)}")
+            logger.exception("Full error details:")
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"Database error while adding backup: {str(e)}")
+            logger.exception("Full error details:")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error while adding backup: {str(e)}")
+            logger.exception("Full error details:")
+            return None
+
     def get_backups(self, app_id: Optional[int] = None) -> List[Dict]:
         """Get all backups, optionally filtered by app_id."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = self.dict_factory
+        with self._lock, self._conn as conn:
             cursor = conn.cursor()
             
             if app_id:
-                cursor.execute('''
-                    SELECT b.*, a.name as app_name 
-                    FROM backups b
-                    JOIN applications a ON b.app_id = a.id
-                    WHERE app_id = ?
-                    ORDER BY created_at DESC
-                ''', (app_id,))
+                cursor.execute(_SQL_GET_BACKUPS_BY_APP, (app_id,))
             else:
-                cursor.execute('''
-                    SELECT b.*, a.name as app_name 
-                    FROM backups b
-                    JOIN applications a ON b.app_id = a.id
-                    ORDER BY created_at DESC
-                ''')
+                cursor.execute(_SQL_GET_BACKUPS)
             
-            backups = cursor.fetchall()
+            backups = _fetchall_dicts(cursor)
             
             # Parse JSON metadata
             for backup in backups:
                 if backup['metadata']:
-                    backup['metadata'] = json.loads(backup['metadata'])
+                    backup['metadata'] = _loads(backup['metadata'])
             
             return backups
 
+    def get_backup(self, backup_id: int) -> Optional[Dict]:
+        """Get a single backup by id."""
+        with self._lock, self._conn as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SQL_GET_BACKUP, (backup_id,))
+            
+            backup = _fetchone_dict(cursor)
+            
+            # Parse JSON metadata
+            if backup and backup['metadata']:
+                backup['metadata'] = _loads(backup['metadata'])
+            
+            return backup
+
+    def get_backup_path(self, backup_id: int) -> Optional[str]:
+        """Get the storage path of a backup without loading its record."""
+        with self._lock, self._conn as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SQL_GET_BACKUP_PATH, (backup_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def get_storage_stats(self) -> Dict:
+        """Get the total size and number of backups."""
+        with self._lock, self._conn as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SQL_STORAGE_STATS)
+            return _fetchone_dict(cursor)
+
     def add_backup(self, backup_data: Dict) -> Optional[Dict]:
-        """Add a new backup."""
+        """Add a new backup; the returned row has no app_name, which callers already know."""
         try:
             logger.info(f"Adding backup to database: {backup_data}")
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = self.dict_factory
-                cursor = conn.cursor()
-                
-                # Convert metadata to JSON string
-                if 'metadata' in backup_data and backup_data['metadata']:
-                    backup_data['metadata'] = json.dumps(backup_data['metadata'])
-                    logger.info("Converted metadata to JSON string")
-
-                logger.info("Inserting backup record")
-                cursor.execute('''
-                    INSERT INTO backups (app_id, filename, storage_path, size, metadata)
-                    VALUES (:app_id, :filename, :storage_path, :size, :metadata)
-                ''', backup_data)
-                
-                # Get the inserted backup
-                logger.info("Retrieving inserted backup record")
-                cursor.execute('''
-                    SELECT b.*, a.name as app_name 
-                    FROM backups b
-                    JOIN applications a ON b.app_id = a.id
-                    WHERE b.id = ?
-                ''', (cursor.lastrowid,))
-                
-                backup = cursor.fetchone()
-                
-                # Parse JSON metadata in response
-                if backup and backup['metadata']:
-                    try:
-                        backup['metadata'] = json.loads(backup['metadata'])
-                        logger.info("Successfully parsed backup metadata")
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"Failed to parse backup metadata: {e}")
-                
+            with self._lock, self._conn as conn:
+                backup = self._insert_backup(conn.cursor(), backup_data)
                 logger.info(f"Successfully created backup record: {backup}")
                 return backup
 
@@ -237,27 +422,139 @@ class Database:
             logger.exception("Full error details:")
             return None
 
+    def add_backups_bulk(self, rows: List[Dict]) -> bool:
+        """Record several backups, and their applications, in a single transaction.
+
+        Each row holds the backup's filename, storage_path, size and metadata,
+        with its application's data under 'app'. Applications are upserted once
+        each, then every backup is inserted with one executemany. Returns
+        False, with nothing written, if any of it fails.
+        """
+        try:
+            logger.info(f"Adding {len(rows)} backups to database")
+            with self._lock, self._conn as conn:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN')
+                app_ids = {}
+                for row in rows:
+                    path = row['app']['path']
+                    if path not in app_ids:
+                        app = self._upsert_application(cursor, dict(row['app']))
+                        if not app:
+                            raise sqlite3.DatabaseError("Application upsert returned no row")
+                        app_ids[path] = app['id']
+                cursor.executemany(_SQL_INSERT_BACKUP, [
+                    {
+                        'app_id': app_ids[row['app']['path']],
+                        'filename': row['filename'],
+                        'storage_path': row['storage_path'],
+                        'size': row['size'],
+                        'metadata': _dumps(row['metadata']) if row.get('metadata') is not None else None
+                    }
+                    for row in rows
+                ])
+            return True
+
+        except sqlite3.Error as e:
+            logger.error(f"Database error while adding backups: {str(e)}")
+            logger.exception("Full error details:")
+            return False
+
     def update_backup_restored(self, backup_id: int) -> bool:
         """Update backup restored timestamp."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._lock, self._conn as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE backups 
-                    SET restored_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (backup_id,))
+                cursor.execute(_SQL_MARK_RESTORED, (backup_id,))
                 conn.commit()
                 return True
         except sqlite3.Error:
             return False
 
+    async def submit_write(self, op: str, *args) -> bool:
+        """Queue a single-row write and wait for the batch that commits it.
+
+        Returns whether a row was affected.
+        """
+        loop = asyncio.get_running_loop()
+        if self._writer_task is None or self._writer_task.done() or self._writer_task.get_loop() is not loop:
+            # Writes still queued for a writer on another loop would never be flushed
+            self._stop_writer(RuntimeError("Database writer restarted on another event loop"))
+            self._writer_queue = asyncio.Queue()
+            self._writer_task = loop.create_task(self._writer_loop(self._writer_queue))
+        future = loop.create_future()
+        await self._writer_queue.put((op, args, future))
+        return await future
+
+    def _stop_writer(self, error: Exception) -> None:
+        """Cancel the writer task and fail the writes still in its queue with error."""
+        task, queue = self._writer_task, self._writer_queue
+        self._writer_task = self._writer_queue = None
+        if task is None:
+            return
+        loop = task.get_loop()
+        pending = []
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not None:
+                pending.append(item[2])
+        if pending:
+            logger.warning(f"Failing {len(pending)} queued database writes: {error}")
+        # Futures and tasks belong to their loop, so they are resolved on it
+        if loop.is_closed():
+            return
+        for future in pending:
+            loop.call_soon_threadsafe(_fail_future, future, error)
+        loop.call_soon_threadsafe(task.cancel)
+
+    async def _writer_loop(self, queue: asyncio.Queue):
+        """Drain queued writes, committing each batch in a single transaction, until a None item."""
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                return
+            batch = [item]
+            try:
+                # Give concurrent writers a moment to join this batch
+                await asyncio.sleep(WRITE_FLUSH_INTERVAL)
+                while len(batch) < WRITE_BATCH_SIZE and not queue.empty():
+                    item = queue.get_nowait()
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                results = await asyncio.to_thread(self._execute_writes, [(op, args) for op, args, _ in batch])
+            except asyncio.CancelledError:
+                # Writers waiting on this batch would otherwise never wake
+                for _, _, future in batch:
+                    _fail_future(future, RuntimeError("Database writer stopped"))
+                raise
+            except Exception as e:
+                logger.error(f"Database error while flushing {len(batch)} writes: {str(e)}")
+                results = [False] * len(batch)
+
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _execute_writes(self, writes: List[Tuple[str, tuple]]) -> List[bool]:
+        """Run queued writes in one transaction, returning whether each affected a row."""
+        with self._lock, self._conn as conn:
+            cursor = conn.cursor()
+            results = []
+            for op, args in writes:
+                cursor.execute(_WRITE_OPS[op], args)
+                results.append(cursor.rowcount > 0)
+            return results
+
     def delete_backup(self, backup_id: int) -> bool:
         """Delete a backup."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._lock, self._conn as conn:
                 cursor = conn.cursor()
-                cursor.execute('DELETE FROM backups WHERE id = ?', (backup_id,))
+                cursor.execute(_SQL_DELETE_BACKUP, (backup_id,))
                 conn.commit()
                 return cursor.rowcount > 0
         except sqlite3.Error:
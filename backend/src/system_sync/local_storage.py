@@ -1,20 +1,63 @@
 import os
-import shutil
-from typing import Optional, Dict, List
+import asyncio
+import hashlib
+import uuid
+from typing import Optional, Dict, List, Set, Tuple, AsyncIterator
 from datetime import datetime
 import logging
 from pathlib import Path
+import aiofiles
 from .database import Database
+from .fs_utils import copy_file
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Chunk size for copies that hash their contents or report progress
+UPLOAD_COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+def _copy_hashed(src_path: str, dst_path: str, callback=None) -> Tuple[int, str]:
+    """Copy a file in chunks, returning its size and SHA-256 computed in the same pass."""
+    digest = hashlib.sha256()
+    copied = 0
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        total = os.fstat(src.fileno()).st_size
+        while chunk := src.read(UPLOAD_COPY_CHUNK_SIZE):
+            dst.write(chunk)
+            digest.update(chunk)
+            copied += len(chunk)
+            if callback and total:
+                callback((copied / total) * 100)
+    return copied, digest.hexdigest()
+
 class LocalStorage:
     def __init__(self):
         """Initialize local storage."""
         self.storage_dir = Path.home() / '.system_sync' / 'storage'
         self.db = Database()
         os.makedirs(self.storage_dir, exist_ok=True)
+        # Directories under storage_dir already known to exist
+        self._mkdir_cache: Set[str] = set()
+
+    def close(self):
+        """Close the database connection."""
+        self.db.close()
+
+    async def aclose(self):
+        """Flush queued database writes, then close the connection."""
+        await self.db.aclose()
+
+    def _ensure_parent_dir(self, path: str) -> None:
+        """Create a file's parent directory unless it is already known to exist.
+
+        Only directories inside storage_dir are remembered; anything else, such
+        as a download destination, may be removed by its owner between calls.
+        """
+        parent = os.path.dirname(path)
+        if parent not in self._mkdir_cache:
+            os.makedirs(parent, exist_ok=True)
+            if Path(parent).is_relative_to(self.storage_dir):
+                self._mkdir_cache.add(parent)
 
     def _get_storage_path(self, app_name: str, filename: str) -> str:
         """Get the storage path for a backup file."""
@@ -24,90 +67,60 @@ class LocalStorage:
                           app_name: str, 
                           file_path: str, 
                           metadata: Dict,
-                          total_size: Optional[int] = None,
                           callback=None) -> Optional[str]:
-        """Store backup in local storage and record in database."""
+        """Store backup in local storage and record in database.
+
+        The SHA-256 of the contents is computed during the copy and stored as
+        metadata['sha256'], which restores verify against.
+        """
         try:
             logger.info(f"Starting backup upload for {app_name}")
             logger.info(f"File path: {file_path}")
             logger.info(f"Metadata: {metadata}")
-            logger.info(f"Total size: {total_size}")
             
             file_name = os.path.basename(file_path)
-            file_size = os.path.getsize(file_path)
-            logger.info(f"Actual file size: {file_size}")
-            
-            # Verify file size matches expected size if provided
-            if total_size and abs(file_size - total_size) > 1024:  # Allow 1KB difference
-                logger.error(f"File size mismatch. Expected: {total_size}, Got: {file_size}")
-                raise Exception("Backup file size does not match expected size")
-            
-            # Get or create application record
-            app_data = {
-                'name': app_name,
-                'path': file_path,
-                'category': metadata.get('category', 'Development'),
-                'type': metadata.get('type', 'Application'),
-                'size': file_size,
-                'settings': metadata.get('settings', [])
-            }
-            logger.info(f"Creating application record with data: {app_data}")
-            
-            app = self.db.add_application(app_data)
-            if not app:
-                logger.error("Failed to create application record")
-                raise Exception(f"Failed to create application record for {app_name}")
 
             # Create storage path
             storage_path = self._get_storage_path(app_name, file_name)
             logger.info(f"Storage path: {storage_path}")
-            os.makedirs(os.path.dirname(storage_path), exist_ok=True)
+            self._ensure_parent_dir(storage_path)
             
-            # Copy file to storage with progress tracking
+            # Copy file to storage, hashing it in the same pass
             logger.info("Copying file to storage")
             try:
-                with open(file_path, 'rb') as src, open(storage_path, 'wb') as dst:
-                    # Copy in chunks to handle large files
-                    chunk_size = 1024 * 1024  # 1MB chunks
-                    copied = 0
-                    while True:
-                        chunk = src.read(chunk_size)
-                        if not chunk:
-                            break
-                        dst.write(chunk)
-                        copied += len(chunk)
-                        if callback:
-                            progress = (copied / file_size) * 100
-                            callback(progress)
+                file_size, metadata['sha256'] = _copy_hashed(file_path, storage_path, callback)
             except Exception as e:
                 logger.error(f"Error copying file: {str(e)}")
                 if os.path.exists(storage_path):
                     os.remove(storage_path)
                 raise
+            logger.info(f"Copied {file_size} bytes to storage")
 
-            # Verify copied file size
-            copied_size = os.path.getsize(storage_path)
-            if copied_size != file_size:
-                logger.error(f"Copied file size mismatch. Expected: {file_size}, Got: {copied_size}")
-                os.remove(storage_path)
-                raise Exception("Backup file was not copied correctly")
+            app_data = {
+                'name': app_name,
+                'path': file_path,
+                'category': metadata.get('category', 'Development'),
+                'type': metadata.get('type', 'Application'),
+                'size': file_size,
+                'settings': metadata.get('settings', [])
+            }
 
-            # Create backup record
+            # Create application and backup records in one transaction
             backup_data = {
-                'app_id': app['id'],
                 'filename': file_name,
                 'storage_path': storage_path,
                 'size': file_size,
                 'metadata': metadata
             }
-            logger.info(f"Creating backup record with data: {backup_data}")
+            logger.info(f"Creating application and backup records with data: {app_data}, {backup_data}")
 
-            backup = self.db.add_backup(backup_data)
+            backup = self.db.add_application_and_backup(app_data, backup_data)
             if not backup:
-                logger.error("Failed to create backup record")
+                logger.error("Failed to create application and backup records")
                 if os.path.exists(storage_path):
                     os.remove(storage_path)
                 return None
+            backup['app_name'] = app_name
             
             logger.info("Backup upload completed successfully")
             return storage_path
@@ -117,28 +130,182 @@ class LocalStorage:
             logger.exception("Full error details:")
             return None
 
+    async def upload_backups_bulk(self, uploads: List[Tuple[str, str, Dict]]) -> List[str]:
+        """Store several backups and record them in one database transaction.
+
+        uploads holds (app_name, file_path, metadata) tuples. Files are copied
+        concurrently, each hashed into metadata['sha256'] as in upload_backup.
+        Returns their storage paths, or an empty list with nothing stored.
+        """
+        storage_paths = []
+        try:
+            logger.info(f"Starting bulk upload of {len(uploads)} backups")
+            for app_name, file_path, _ in uploads:
+                storage_path = self._get_storage_path(app_name, os.path.basename(file_path))
+                self._ensure_parent_dir(storage_path)
+                storage_paths.append(storage_path)
+
+            # Copy and hash the files on worker threads, letting every copy finish before any cleanup
+            copies = await asyncio.gather(*(
+                asyncio.to_thread(_copy_hashed, file_path, storage_path)
+                for (_, file_path, _), storage_path in zip(uploads, storage_paths)
+            ), return_exceptions=True)
+            for copy in copies:
+                if isinstance(copy, BaseException):
+                    raise copy
+
+            rows = []
+            for (app_name, file_path, metadata), storage_path, (file_size, content_hash) in zip(uploads, storage_paths, copies):
+                metadata['sha256'] = content_hash
+                rows.append({
+                    'app': {
+                        'name': app_name,
+                        'path': file_path,
+                        'category': metadata.get('category', 'Development'),
+                        'type': metadata.get('type', 'Application'),
+                        'size': file_size,
+                        'settings': metadata.get('settings', [])
+                    },
+                    'filename': os.path.basename(file_path),
+                    'storage_path': storage_path,
+                    'size': file_size,
+                    'metadata': metadata
+                })
+
+            # Record every application and backup in one transaction
+            if not self.db.add_backups_bulk(rows):
+                raise Exception("Failed to create backup records")
+
+            logger.info("Bulk backup upload completed successfully")
+            return storage_paths
+
+        except Exception as e:
+            logger.error(f"Error storing backups: {str(e)}")
+            logger.exception("Full error details:")
+            for storage_path in storage_paths:
+                if os.path.exists(storage_path):
+                    os.remove(storage_path)
+            return []
+
+    async def upload_backup_stream(self,
+                                 app_name: str,
+                                 chunks: AsyncIterator[bytes],
+                                 metadata: Dict,
+                                 total_size: Optional[int] = None) -> Optional[str]:
+        """Write a streamed backup straight to local storage and record it in the database.
+
+        Size and SHA-256 are computed while the chunks are written, so the
+        upload is only written to disk once.
+        """
+        file_name = f"{app_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.zip"
+        storage_path = self._get_storage_path(app_name, file_name)
+        try:
+            logger.info(f"Starting streamed backup upload for {app_name}")
+            logger.info(f"Storage path: {storage_path}")
+            self._ensure_parent_dir(storage_path)
+
+            # Write chunks to storage, hashing in the same pass
+            file_size = 0
+            digest = hashlib.sha256()
+            async with aiofiles.open(storage_path, 'wb') as dst:
+                async for chunk in chunks:
+                    await dst.write(chunk)
+                    digest.update(chunk)
+                    file_size += len(chunk)
+            logger.info(f"Wrote {file_size} bytes to storage")
+
+            # Verify file size matches expected size if provided
+            if total_size and file_size != total_size:
+                logger.error(f"File size mismatch. Expected: {total_size}, Got: {file_size}")
+                raise Exception("Backup file size does not match expected size")
+
+            metadata['sha256'] = digest.hexdigest()
+
+            # Get or create application record
+            app_data = {
+                'name': app_name,
+                'path': storage_path,
+                'category': metadata.get('category', 'Development'),
+                'type': metadata.get('type', 'Application'),
+                'size': file_size,
+                'settings': metadata.get('settings', [])
+            }
+            # Create application and backup records in one transaction
+            backup = self.db.add_application_and_backup(app_data, {
+                'filename': file_name,
+                'storage_path': storage_path,
+                'size': file_size,
+                'metadata': metadata
+            })
+            if not backup:
+                raise Exception("Failed to create backup record")
+            backup['app_name'] = app_name
+
+            logger.info("Streamed backup upload completed successfully")
+            return storage_path
+
+        except Exception as e:
+            logger.error(f"Error storing streamed backup: {str(e)}")
+            logger.exception("Full error details:")
+            if os.path.exists(storage_path):
+                os.remove(storage_path)
+            return None
+
     async def download_backup(self, 
                             storage_path: str, 
                             destination: str,
-                            callback=None) -> bool:
-        """Copy backup from local storage to destination."""
+                            callback=None,
+                            expected_sha256: Optional[str] = None) -> bool:
+        """Copy backup from local storage to destination.
+
+        With expected_sha256, the copy is hashed as it is made and rejected
+        if it doesn't match; the destination is left for the caller to discard.
+        """
         try:
             # Ensure destination directory exists
-            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            self._ensure_parent_dir(destination)
             
-            # Copy file to destination
-            shutil.copy2(storage_path, destination)
+            if expected_sha256:
+                _, content_hash = _copy_hashed(storage_path, destination, callback)
+                if content_hash != expected_sha256:
+                    logger.error(f"Backup {storage_path} failed verification: SHA-256 {content_hash}, expected {expected_sha256}")
+                    return False
+                return True
+
+            # Copy file to destination, cloning it where the filesystem supports it
+            copy_file(storage_path, destination)
             return True
 
         except Exception as e:
             logger.error(f"Error retrieving backup: {str(e)}")
             return False
 
+    async def read_backup(self, storage_path: str, expected_sha256: Optional[str] = None) -> Optional[bytes]:
+        """Read a stored backup into memory, verifying it against expected_sha256 if given."""
+        try:
+            async with aiofiles.open(storage_path, 'rb') as f:
+                data = await f.read()
+            if expected_sha256:
+                content_hash = hashlib.sha256(data).hexdigest()
+                if content_hash != expected_sha256:
+                    logger.error(f"Backup {storage_path} failed verification: SHA-256 {content_hash}, expected {expected_sha256}")
+                    return None
+            return data
+        except Exception as e:
+            logger.error(f"Error reading backup: {str(e)}")
+            return None
+
+    async def iter_backup(self, storage_path: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """Yield the contents of a stored backup in chunks."""
+        async with aiofiles.open(storage_path, 'rb') as f:
+            while chunk := await f.read(chunk_size):
+                yield chunk
+
     async def update_backup_restored(self, backup_id: int) -> bool:
         """Update backup restored timestamp."""
         try:
             logger.info(f"Updating backup {backup_id} as restored")
-            return self.db.update_backup_restored(backup_id)
+            return await self.db.submit_write('mark_restored', backup_id)
         except Exception as e:
             logger.error(f"Error updating backup restored status: {str(e)}")
             return False
@@ -151,22 +318,29 @@ class LocalStorage:
             logger.error(f"Error listing backups: {str(e)}")
             return []
 
+    async def get_backup(self, backup_id: int) -> Optional[Dict]:
+        """Get a single backup record."""
+        try:
+            return self.db.get_backup(backup_id)
+        except Exception as e:
+            logger.error(f"Error getting backup: {str(e)}")
+            return None
+
     async def delete_backup(self, backup_id: int) -> bool:
         """Delete backup from storage and database."""
         try:
-            # Get backup info
-            backups = self.db.get_backups()
-            backup = next((b for b in backups if b['id'] == backup_id), None)
+            # Get backup file location
+            storage_path = self.db.get_backup_path(backup_id)
             
-            if not backup:
+            if not storage_path:
                 return False
 
             # Delete file from storage
-            if os.path.exists(backup['storage_path']):
-                os.remove(backup['storage_path'])
+            if os.path.exists(storage_path):
+                os.remove(storage_path)
             
             # Delete from database
-            return self.db.delete_backup(backup_id)
+            return await self.db.submit_write('delete_backup', backup_id)
 
         except Exception as e:
             logger.error(f"Error deleting backup: {str(e)}")
@@ -175,14 +349,7 @@ class LocalStorage:
     async def get_storage_usage(self) -> Dict:
         """Get storage usage statistics."""
         try:
-            backups = self.db.get_backups()
-            total_size = sum(backup['size'] for backup in backups)
-            backup_count = len(backups)
-            
-            return {
-                'total_size': total_size,
-                'backup_count': backup_count
-            }
+            return self.db.get_storage_stats()
 
         except Exception as e:
             logger.error(f"Error getting storage usage: {str(e)}")
@@ -1,16 +1,38 @@
-from supabase import create_client
+from supabase import Client, create_client
 import os
+import functools
+from typing import Dict, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+@functools.lru_cache(maxsize=1)
+def get_client() -> Client:
+    """Create the Supabase client on first use, from credentials in the environment."""
+    url = os.getenv('SUPABASE_URL')
+    key = os.getenv('SUPABASE_KEY')
+    if not url or not key:
+        raise ValueError("Supabase credentials not found in environment variables")
+    return create_client(url, key)
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Supabase credentials not found in environment variables")
+def get_s3_config() -> Optional[Dict[str, str]]:
+    """Get the S3-compatible storage client settings used for multipart uploads.
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    Returns None unless access keys are configured and an endpoint is set,
+    either directly or through SUPABASE_URL.
+    """
+    url = os.getenv('SUPABASE_URL')
+    endpoint = os.getenv('SUPABASE_S3_ENDPOINT') or (f"{url}/storage/v1/s3" if url else None)
+    access_key_id = os.getenv('SUPABASE_S3_ACCESS_KEY_ID')
+    secret_access_key = os.getenv('SUPABASE_S3_SECRET_ACCESS_KEY')
+    if not endpoint or not access_key_id or not secret_access_key:
+        return None
+    return {
+        'endpoint_url': endpoint,
+        'region_name': os.getenv('SUPABASE_S3_REGION', 'us-east-1'),
+        'aws_access_key_id': access_key_id,
+        'aws_secret_access_key': secret_access_key,
+    }
 
 # Database table names
 BACKUPS_TABLE = 'backups'
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import threading
+from collections import deque
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TempFilePool:
+    """Pool of reusable scratch files for per-request downloads.
+
+    Released files are truncated and handed out again instead of being
+    unlinked, saving the create/unlink cycle of a fresh temp file per request.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_size: int = 32, suffix: str = '.zip'):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'system_sync_scratch')
+        self.max_size = max_size
+        self.suffix = suffix
+        self._free = deque()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def acquire(self) -> str:
+        """Get the path of an empty scratch file."""
+        with self._lock:
+            if self._free:
+                return self._free.popleft()
+        fd, path = tempfile.mkstemp(suffix=self.suffix, dir=self.directory)
+        os.close(fd)
+        return path
+
+    def release(self, path: str) -> None:
+        """Return a scratch file to the pool, or delete it if the pool is full."""
+        try:
+            with self._lock:
+                if len(self._free) < self.max_size:
+                    os.truncate(path, 0)
+                    self._free.append(path)
+                    return
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Failed to release scratch file {path}: {e}")
+
+# Shared pool for the current process
+scratch_files = TempFilePool()
@@ -1,20 +1,243 @@
 #!/usr/bin/env python3
 
 import os
+import io
+import posixpath
 import sys
 import json
+import hashlib
 import shutil
+import string
+import plistlib
 import platform
 import subprocess
 import tempfile
 import zipfile
+import gzip
+import tarfile
+import threading
+import weakref
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 import logging
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, NamedTuple, Optional, Tuple, Any, Callable, Union
+from .fs_utils import link_or_copy
+from .chunk_store import ChunkStore, read_manifest
 
 logger = logging.getLogger(__name__)
 
+try:
+    import httpx
+    try:
+        import h2  # noqa: F401  (httpx needs it for HTTP/2)
+        HTTP2_AVAILABLE = True
+    except ImportError:
+        HTTP2_AVAILABLE = False
+except ImportError:  # Downloads go through requests instead
+    httpx = None
+    HTTP2_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:  # Windows, where extracted trees aren't cached
+    fcntl = None
+
+# Errors raised by either HTTP client
+_HTTP_ERRORS = (requests.RequestException,) + ((httpx.HTTPError,) if httpx else ())
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps_pretty(obj) -> bytes:
+        """Serialize a settings file with two-space indentation."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:  # Fall back to the standard library
+    _loads = json.loads
+
+    def _dumps_pretty(obj) -> bytes:
+        """Serialize a settings file with two-space indentation."""
+        return json.dumps(obj, indent=2).encode()
+
+# Bytes copied per read when streaming the VS Code download to disk
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Parallel ranged downloads; smaller files are fetched over a single connection
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_MIN_PARALLEL_SIZE = 16 * 1024 * 1024
+
+# Extensions installed per VS Code CLI launch in generated scripts; keeps command lines well under cmd.exe's limit
+EXTENSION_INSTALL_BATCH = 32
+
+# Largest macOS download extracted straight from memory instead of a file on disk
+DOWNLOAD_IN_MEMORY_LIMIT = 512 * 1024 * 1024
+
+# Downloaded installers are kept here and revalidated with conditional requests
+VSCODE_CACHE_DIR = os.environ.get(
+    "VSCODE_CACHE_DIR",
+    os.path.join(str(Path.home()), ".cache", "system_sync", "vscode")
+)
+
+class _ScriptTemplate(string.Template):
+    """Template with @{name} placeholders and @@ for a literal @, leaving shell $ and batch % syntax untouched."""
+    delimiter = '@'
+    pattern = r'@\{(?P<braced>[a-z_]+)\}|(?P<escaped>@@)|(?P<named>(?!))|(?P<invalid>(?!))'
+
+def _write_json_atomic(path: str, obj) -> None:
+    """Write obj as JSON to path through a temporary file, so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+class _TeeReader:
+    """File-like reader that copies everything read from a stream into a sink."""
+    
+    def __init__(self, stream, sink):
+        self.stream = stream
+        self.sink = sink
+        
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.sink.write(data)
+        return data
+
+def _parallel_extract(source: Union[str, bytes], extract_dir: str) -> None:
+    """
+    Extract a zip file, given as a path or its bytes, with members inflated concurrently.
+    
+    Directories are created up front; each worker thread reads through its
+    own ZipFile handle, and zlib releases the GIL while inflating.
+    """
+    def open_zip() -> zipfile.ZipFile:
+        return zipfile.ZipFile(io.BytesIO(source) if isinstance(source, bytes) else source, 'r')
+        
+    with open_zip() as zf:
+        members = zf.infolist()
+        
+    # Create every directory serially so workers never race on makedirs
+    file_members = []
+    dirs = set()
+    root = os.path.abspath(extract_dir)
+    for info in members:
+        target = os.path.abspath(os.path.join(root, *info.filename.split('/')))
+        if os.path.commonpath([root, target]) != root:
+            # Leave unsafe names to ZipFile.extract, which sanitizes them
+            file_members.append(info)
+            continue
+        if info.is_dir():
+            dirs.add(target)
+        else:
+            dirs.add(os.path.dirname(target))
+            file_members.append(info)
+    for directory in sorted(dirs):
+        os.makedirs(directory, exist_ok=True)
+        
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+    
+    def extract(info: zipfile.ZipInfo) -> None:
+        zf = getattr(local, 'zf', None)
+        if zf is None:
+            zf = local.zf = open_zip()
+            with handles_lock:
+                handles.append(zf)
+        zf.extract(info, extract_dir)
+        
+    try:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            list(executor.map(extract, file_members))
+    finally:
+        for zf in handles:
+            zf.close()
+
+# Already-compressed formats, stored in zip packages as-is since deflating them saves almost nothing
+ZIP_STORED_SUFFIXES = (
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".icns",
+    ".woff", ".woff2", ".zip", ".vsix", ".gz", ".xz", ".br",
+)
+
+def _zip_tree(src_dir: str, zip_path: str, level: int = 6,
+              stored_suffixes: Tuple[str, ...] = ZIP_STORED_SUFFIXES) -> None:
+    """
+    Zip a directory with zipfile, for when no native archiver is available.
+    
+    Entries are named relative to the parent of src_dir, like shutil.make_archive.
+    zipfile streams each file through the compressor in chunks, so memory use
+    doesn't grow with file size. Files with one of stored_suffixes are stored
+    uncompressed.
+    """
+    base = os.path.dirname(os.path.abspath(src_dir))
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=level, allowZip64=True) as zf:
+        for root, dirs, files in os.walk(src_dir):
+            dirs.sort()
+            zf.write(root, os.path.relpath(root, base))
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if not os.path.isfile(path):
+                    continue
+                stored = name.lower().endswith(stored_suffixes)
+                zf.write(path, os.path.relpath(path, base),
+                         compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+
+def _gzip_command(level: int = 1) -> List[str]:
+    """Get the command that gzips stdin to stdout at a level, using every core when pigz is installed"""
+    pigz = shutil.which("pigz")
+    if pigz:
+        return [pigz, "-p", str(os.cpu_count() or 1), f"-{level}"]
+    return ["gzip", f"-{level}"]
+
+class PlatformConfig(NamedTuple):
+    """Where VS Code comes from and where its settings live on one platform"""
+    download_url: str
+    app_name: str
+    settings_dir_template: str
+
+_PLATFORM_CONFIGS = {
+    "darwin": PlatformConfig(
+        "https://code.visualstudio.com/sha/download?build=stable&os=darwin-universal",
+        "Visual Studio Code.app",
+        "Library/Application Support/Code/User"
+    ),
+    "darwin-arm64": PlatformConfig(
+        "https://code.visualstudio.com/sha/download?build=stable&os=darwin-arm64",
+        "Visual Studio Code.app",
+        "Library/Application Support/Code/User"
+    ),
+    "windows": PlatformConfig(
+        "https://code.visualstudio.com/sha/download?build=stable&os=win32-x64-user",
+        "VSCode",
+        "AppData/Roaming/Code/User"
+    ),
+    "linux": PlatformConfig(
+        "https://code.visualstudio.com/sha/download?build=stable&os=linux-x64",
+        "code",
+        ".config/Code/User"
+    ),
+}
+
+# Resolved once; platform.system() and platform.machine() may shell out to uname
+_SYSTEM = platform.system().lower()
+_ARCH = platform.machine().lower()
+_PLATFORM_CONFIG = _PLATFORM_CONFIGS.get(
+    "darwin-arm64" if _SYSTEM == "darwin" and "arm" in _ARCH else _SYSTEM
+)
+
+# LZFSE images (ULFO) compress faster than zlib (UDZO) but need macOS 10.11 or later
+_MACOS_VERSION = tuple(int(part) for part in platform.mac_ver()[0].split(".")[:2] if part.isdigit())
+_LZFSE_SUPPORTED = _MACOS_VERSION >= (10, 11)
+_DMG_ULFO_ARGS = ["-format", "ULFO"]
+_DMG_UDZO_ARGS = ["-format", "UDZO"]
+
 class VSCodePackager:
     """
     Downloads VS Code, extracts user settings from a backup,
@@ -23,110 +246,368 @@ class VSCodePackager:
     """
     
     # VS Code download URLs
-    VSCODE_DOWNLOAD_URLS = {
-        "darwin": "https://code.visualstudio.com/sha/download?build=stable&os=darwin-universal",
-        "darwin-arm64": "https://code.visualstudio.com/sha/download?build=stable&os=darwin-arm64",
-        "windows": "https://code.visualstudio.com/sha/download?build=stable&os=win32-x64-user",
-        "linux": "https://code.visualstudio.com/sha/download?build=stable&os=linux-x64"
-    }
+    VSCODE_DOWNLOAD_URLS = {key: config.download_url for key, config in _PLATFORM_CONFIGS.items()}
     
-    def __init__(self, temp_dir: Optional[str] = None):
+    def __init__(self, temp_dir: Optional[str] = None, legacy_compat: bool = False, compresslevel: int = 1):
         """
         Initialize the VS Code packager.
         
         Args:
             temp_dir: Optional temporary directory to use for processing
+            legacy_compat: Build zlib (UDZO) DMGs that open on macOS before 10.11
+            compresslevel: zlib/gzip level from 1 (fastest) to 9 (smallest) for packages;
+                LZFSE (ULFO) DMGs have no level
         """
-        self.system = platform.system().lower()
-        self.arch = platform.machine().lower()
+        self.system = _SYSTEM
+        self.arch = _ARCH
+        self.legacy_compat = legacy_compat
         
-        # Set the download URL based on platform and architecture
-        if self.system == "darwin" and "arm" in self.arch:
-            self.download_url = self.VSCODE_DOWNLOAD_URLS["darwin-arm64"]
-        else:
-            self.download_url = self.VSCODE_DOWNLOAD_URLS.get(self.system)
-            
-        if not self.download_url:
+        if not 1 <= compresslevel <= 9:
+            raise ValueError(f"compresslevel must be between 1 and 9, got {compresslevel}")
+        self.compresslevel = compresslevel
+        
+        if _PLATFORM_CONFIG is None:
             raise ValueError(f"Unsupported platform: {self.system}")
             
+        # Set platform-specific URL, paths and variables
+        self.download_url = _PLATFORM_CONFIG.download_url
+        self.vscode_app_name = _PLATFORM_CONFIG.app_name
+        self.settings_dir_template = _PLATFORM_CONFIG.settings_dir_template
+        # Path components of the settings directory, matched against the tail of candidate paths
+        self._settings_dir_parts = tuple(self.settings_dir_template.replace("\\", "/").split("/"))
+            
+        # Share warm connections between the download workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=DOWNLOAD_WORKERS, pool_maxsize=DOWNLOAD_WORKERS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # With httpx, installer downloads multiplex over one HTTP/2 connection where the server allows
+        self._http = None
+        if httpx is not None:
+            self._http = httpx.Client(
+                http2=HTTP2_AVAILABLE,
+                follow_redirects=True,
+                timeout=None,
+                limits=httpx.Limits(max_connections=DOWNLOAD_WORKERS, max_keepalive_connections=DOWNLOAD_WORKERS)
+            )
+            
+        # Open locks on the cached extractions in use, see _cached_extraction
+        self._tree_locks = []
+        
         # Create a temporary directory if not provided
         if temp_dir:
             self.temp_dir = temp_dir
-            self.should_cleanup_temp = False
+            self._tmp = None
         else:
-            self.temp_dir = tempfile.mkdtemp(prefix="vscode_packager_")
-            self.should_cleanup_temp = True
-            
-        # Set platform-specific paths and variables
-        if self.system == "darwin":
-            self.vscode_app_name = "Visual Studio Code.app"
-            self.settings_dir_template = "Library/Application Support/Code/User"
-        elif self.system == "windows":
-            self.vscode_app_name = "VSCode"
-            self.settings_dir_template = "AppData/Roaming/Code/User"
-        elif self.system == "linux":
-            self.vscode_app_name = "code"
-            self.settings_dir_template = ".config/Code/User"
-        else:
-            raise ValueError(f"Unsupported platform: {self.system}")
+            self._tmp = tempfile.TemporaryDirectory(prefix="vscode_packager_")
+            self.temp_dir = self._tmp.name
+            # Remove the directory when the packager is collected or at interpreter exit
+            weakref.finalize(self, self._tmp.cleanup)
     
-    def __del__(self):
-        """Clean up temporary directory if needed"""
-        if hasattr(self, 'should_cleanup_temp') and self.should_cleanup_temp and os.path.exists(self.temp_dir):
+    def cleanup(self):
+        """Close HTTP connections and remove the temporary directory if the packager created it"""
+        self.session.close()
+        # Release the extracted trees this run was using
+        for lock in self._tree_locks:
+            lock.close()
+        self._tree_locks.clear()
+        if self._http is not None:
+            self._http.close()
+        if self._tmp is not None:
             try:
-                shutil.rmtree(self.temp_dir)
+                self._tmp.cleanup()
             except Exception as e:
                 logger.warning(f"Failed to clean up temporary directory: {e}")
     
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+    
+    def _cache_paths(self) -> Tuple[str, str]:
+        """Get the cached installer path and its metadata sidecar for the download URL."""
+        key = hashlib.sha256(self.download_url.encode()).hexdigest()[:16]
+        return (os.path.join(VSCODE_CACHE_DIR, f"{key}.bin"),
+                os.path.join(VSCODE_CACHE_DIR, f"{key}.json"))
+    
+    def _installer_sha256(self) -> str:
+        """Get the SHA-256 of the cached installer, hashing it once and recording it in the metadata."""
+        cache_path, meta_path = self._cache_paths()
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if not meta.get("sha256"):
+            digest = hashlib.sha256()
+            with open(cache_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            meta["sha256"] = digest.hexdigest()
+            _write_json_atomic(meta_path, meta)
+        return meta["sha256"]
+    
+    def _cached_extraction(self, cached: str) -> str:
+        """
+        Get the extracted VS Code application for a cached installer, extracting it into the cache the first time.
+        
+        Trees are kept next to the installer, one per installer SHA-256. The returned
+        tree is shared between runs, so it is only ever copied from, never modified.
+        Each run holds a shared lock on its tree until cleanup(); extracting a new
+        installer removes older trees that no run holds.
+        
+        Args:
+            cached: Path to the cached installer
+            
+        Returns:
+            Path to the extracted VS Code application
+        """
+        cache_path, _ = self._cache_paths()
+        trees_dir = os.path.splitext(cache_path)[0] + ".extracted"
+        tree_name = self._installer_sha256()[:16]
+        tree_dir = os.path.join(trees_dir, tree_name)
+        app_name = self.vscode_app_name if self.system == "darwin" else "VSCode-linux-x64"
+        app_path = os.path.join(tree_dir, app_name)
+        
+        # Lock the tree before looking at it, so it can't be pruned from under this run
+        os.makedirs(trees_dir, exist_ok=True)
+        lock = open(os.path.join(trees_dir, f".{tree_name}.lock"), 'a')
+        self._tree_locks.append(lock)
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+        
+        if os.path.isdir(app_path):
+            logger.info(f"Using cached VS Code extraction at {app_path}")
+            return app_path
+        
+        # Extract beside the final location, then move it into place in one step
+        tmp_dir = tempfile.mkdtemp(dir=trees_dir, prefix=".extract-")
+        try:
+            self.extract_vscode(cached, tmp_dir)
+            os.replace(tmp_dir, tree_dir)
+        except OSError:
+            # Another run may have put the same tree in place first
+            if not os.path.isdir(app_path):
+                raise
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        
+        self._prune_trees(trees_dir, tree_dir)
+        logger.info(f"Cached VS Code extraction at {app_path}")
+        return app_path
+    
+    @staticmethod
+    def _prune_trees(trees_dir: str, tree_dir: str) -> None:
+        """Remove extracted trees older than tree_dir that no run holds a lock on."""
+        if fcntl is None:
+            return
+        newest = os.stat(tree_dir).st_mtime
+        for name in os.listdir(trees_dir):
+            path = os.path.join(trees_dir, name)
+            try:
+                if name.startswith(".") or path == tree_dir or os.stat(path).st_mtime >= newest:
+                    continue
+            except FileNotFoundError:
+                continue
+            lock_path = os.path.join(trees_dir, f".{name}.lock")
+            with open(lock_path, 'a') as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                os.remove(lock_path)
+    
+    def _cached_download(self) -> Optional[str]:
+        """
+        Get the cached installer if the server confirms it is still current.
+        
+        Returns:
+            Path to the cached installer, or None if it is missing, truncated or stale
+        """
+        cache_path, meta_path = self._cache_paths()
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if os.path.getsize(cache_path) != meta.get("size"):
+                logger.warning("Cached VS Code download is truncated, ignoring it")
+                return None
+        except (OSError, ValueError):
+            return None
+        
+        headers = {"Accept-Encoding": "identity"}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        
+        try:
+            status, _, _ = self._head(self.download_url, headers)
+        except _HTTP_ERRORS as e:
+            logger.warning(f"Could not revalidate cached VS Code download, using it anyway: {e}")
+            return cache_path
+        
+        if status == 304:
+            logger.info(f"Using cached VS Code download at {cache_path}")
+            return cache_path
+        return None
+    
+    def _head(self, url: str, headers: Dict[str, str]) -> Tuple[int, Any, str]:
+        """
+        Send a HEAD request, following redirects.
+        
+        Returns:
+            Tuple of (status code, response headers, final URL)
+        """
+        if self._http is not None:
+            response = self._http.head(url, headers=headers)
+            return response.status_code, response.headers, str(response.url)
+        response = self.session.head(url, allow_redirects=True, headers=headers)
+        return response.status_code, response.headers, response.url
+    
+    def _get_into(self, url: str, f, headers: Optional[Dict[str, str]] = None,
+                  expected_status: Optional[int] = None) -> Any:
+        """
+        Stream the body of a GET request into an open file.
+        
+        Args:
+            url: URL to fetch
+            f: Binary file object written from its current position
+            headers: Optional request headers
+            expected_status: Status code required before anything is written
+            
+        Returns:
+            The response headers
+        """
+        if self._http is not None:
+            with self._http.stream("GET", url, headers=headers) as response:
+                response.raise_for_status()
+                if expected_status and response.status_code != expected_status:
+                    raise ValueError(f"Unexpected status {response.status_code}")
+                for chunk in response.iter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                return response.headers
+        
+        with self.session.get(url, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            if expected_status and response.status_code != expected_status:
+                raise ValueError(f"Unexpected status {response.status_code}")
+            # Copy the raw stream in large blocks
+            response.raw.decode_content = True
+            shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_SIZE)
+            return response.headers
+    
+    def _new_cache_file(self) -> str:
+        """Create a temporary file in the cache directory for a download in progress."""
+        os.makedirs(VSCODE_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=VSCODE_CACHE_DIR, suffix=".part")
+        os.close(fd)
+        return tmp_path
+    
+    def _commit_cache(self, tmp_path: str, headers) -> str:
+        """Move a completed download into the cache and record its validators."""
+        cache_path, meta_path = self._cache_paths()
+        os.replace(tmp_path, cache_path)
+        _write_json_atomic(meta_path, {
+            "url": self.download_url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "size": os.path.getsize(cache_path)
+        })
+        return cache_path
+    
     def download_vscode(self) -> str:
         """
-        Download the latest version of VS Code.
+        Download the latest version of VS Code, reusing the cached copy when unchanged.
         
         Returns:
             Path to the downloaded file
         """
+        cached = self._cached_download()
+        if cached:
+            return cached
+        
         logger.info(f"Downloading VS Code from {self.download_url}")
+        download_path = self._new_cache_file()
         
-        # Determine file extension based on platform
-        if self.system == "darwin":
-            file_ext = "zip"
-        elif self.system == "windows":
-            file_ext = "exe"
-        else:
-            file_ext = "tar.gz"
+        try:
+            # Check whether the server accepts byte ranges, following redirects to the final URL
+            status, head_headers, final_url = self._head(self.download_url, {"Accept-Encoding": "identity"})
+            total_size = int(head_headers.get("Content-Length", 0))
             
-        download_path = os.path.join(self.temp_dir, f"vscode.{file_ext}")
-        
-        # Download the file
-        response = requests.get(self.download_url, stream=True)
-        response.raise_for_status()
-        
-        with open(download_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+            if 200 <= status < 300 and head_headers.get("Accept-Ranges") == "bytes" and total_size >= DOWNLOAD_MIN_PARALLEL_SIZE:
+                try:
+                    self._download_parallel(final_url, total_size, download_path)
+                    logger.info(f"Downloaded VS Code as {DOWNLOAD_WORKERS} parallel ranges")
+                    return self._commit_cache(download_path, head_headers)
+                except (*_HTTP_ERRORS, ValueError) as e:
+                    logger.warning(f"Parallel download failed, retrying as a single stream: {e}")
+            
+            # Download the file in one stream
+            with open(download_path, 'wb') as f:
+                response_headers = self._get_into(self.download_url, f)
+            download_path = self._commit_cache(download_path, response_headers)
+        finally:
+            if download_path.endswith(".part") and os.path.exists(download_path):
+                os.remove(download_path)
                 
         logger.info(f"Downloaded VS Code to {download_path}")
         return download_path
     
-    def extract_vscode(self, download_path: str) -> str:
+    def _download_parallel(self, url: str, total_size: int, download_path: str) -> None:
+        """
+        Download a file as DOWNLOAD_WORKERS concurrent byte ranges.
+        
+        Args:
+            url: URL that serves byte ranges
+            total_size: Size of the file in bytes
+            download_path: Path to write the file to
+        """
+        # Pre-size the file so each range can be written in place
+        with open(download_path, 'wb') as f:
+            f.truncate(total_size)
+        
+        part_size = -(-total_size // DOWNLOAD_WORKERS)
+        ranges = [
+            (start, min(start + part_size, total_size) - 1)
+            for start in range(0, total_size, part_size)
+        ]
+        
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+            # Consume the results so the first failed range is raised here
+            list(executor.map(lambda r: self._download_range(url, r[0], r[1], download_path), ranges))
+    
+    def _download_range(self, url: str, start: int, end: int, download_path: str) -> None:
+        """
+        Download bytes start..end (inclusive) of a file into the same region of download_path.
+        """
+        headers = {"Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"}
+        with open(download_path, 'r+b') as f:
+            f.seek(start)
+            # A 200 means the server ignored the range; nothing is written in that case
+            self._get_into(url, f, headers, expected_status=206)
+            if f.tell() != end + 1:
+                raise ValueError(f"Incomplete range {start}-{end}")
+    
+    def extract_vscode(self, download_path: str, extract_dir: Optional[str] = None) -> str:
         """
         Extract the downloaded VS Code package.
         
         Args:
             download_path: Path to the downloaded VS Code package
+            extract_dir: Directory to extract into, by default one in the temporary directory
             
         Returns:
             Path to the extracted VS Code application
         """
-        extract_dir = os.path.join(self.temp_dir, "vscode_extracted")
+        extract_dir = extract_dir or os.path.join(self.temp_dir, "vscode_extracted")
         os.makedirs(extract_dir, exist_ok=True)
         
         logger.info(f"Extracting VS Code to {extract_dir}")
         
         if self.system == "darwin":
-            # Extract the zip file
-            with zipfile.ZipFile(download_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
+            # Extract the zip file, inflating members in parallel
+            _parallel_extract(download_path, extract_dir)
             
             # Return the path to the .app bundle
             app_path = os.path.join(extract_dir, self.vscode_app_name)
@@ -147,6 +628,257 @@ class VSCodePackager:
         logger.info(f"Extracted VS Code to {app_path}")
         return app_path
     
+    def download_and_extract(self) -> str:
+        """
+        Download VS Code and extract it without writing the download to disk where possible.
+        
+        Returns:
+            Path to the extracted VS Code application
+        """
+        # A cached installer that is still current is extracted once and reused from the cache
+        cached = self._cached_download()
+        if cached:
+            if self.system == "windows":
+                return self.extract_vscode(cached)
+            return self._cached_extraction(cached)
+        
+        if self.system == "linux":
+            return self.download_and_extract_linux()
+        if self.system == "darwin":
+            app_path = self.download_and_extract_macos()
+            if app_path:
+                return app_path
+        
+        # Windows installers, and macOS downloads too large for memory, go through a file
+        return self.extract_vscode(self.download_vscode())
+    
+    def download_and_extract_macos(self) -> Optional[str]:
+        """
+        Download the macOS VS Code zip into memory and extract it from there.
+        
+        Returns:
+            Path to the extracted VS Code application, or None if the download
+            is larger than DOWNLOAD_IN_MEMORY_LIMIT
+        """
+        extract_dir = os.path.join(self.temp_dir, "vscode_extracted")
+        os.makedirs(extract_dir, exist_ok=True)
+        
+        with self.session.get(self.download_url, stream=True) as response:
+            response.raise_for_status()
+            size = int(response.headers.get("Content-Length", 0))
+            if not size or size > DOWNLOAD_IN_MEMORY_LIMIT:
+                return None
+            
+            logger.info(f"Downloading VS Code from {self.download_url} into memory")
+            response.raw.decode_content = True
+            data = response.raw.read()
+            
+            # Keep a copy for later runs
+            cache_tmp = self._new_cache_file()
+            with open(cache_tmp, 'wb') as f:
+                f.write(data)
+            self._commit_cache(cache_tmp, response.headers)
+        
+        # The zip's central directory is at the end, so it is extracted once fully read
+        logger.info(f"Extracting VS Code to {extract_dir}")
+        _parallel_extract(data, extract_dir)
+        
+        app_path = os.path.join(extract_dir, self.vscode_app_name)
+        logger.info(f"Extracted VS Code to {app_path}")
+        return app_path
+    
+    def download_and_extract_linux(self) -> str:
+        """
+        Download the Linux VS Code tarball and extract it while it streams in.
+        
+        Returns:
+            Path to the extracted VS Code application
+        """
+        extract_dir = os.path.join(self.temp_dir, "vscode_extracted")
+        os.makedirs(extract_dir, exist_ok=True)
+        
+        logger.info(f"Downloading and extracting VS Code from {self.download_url} to {extract_dir}")
+        
+        # tar extracts in its own process as the bytes arrive
+        tar_cmd = ["tar", "-xzf", "-", "-C", extract_dir]
+        
+        def pipe_to_tar(tee: _TeeReader) -> None:
+            tar_p = subprocess.Popen(tar_cmd, stdin=subprocess.PIPE)
+            try:
+                for chunk in iter(lambda: tee.read(DOWNLOAD_CHUNK_SIZE), b""):
+                    tar_p.stdin.write(chunk)
+            finally:
+                tar_p.stdin.close()
+                returncode = tar_p.wait()
+            if returncode:
+                raise subprocess.CalledProcessError(returncode, tar_cmd)
+        
+        self._tee_download(pipe_to_tar)
+        
+        app_path = os.path.join(extract_dir, "VSCode-linux-x64")
+        logger.info(f"Extracted VS Code to {app_path}")
+        return app_path
+    
+    def _read_linux_tarball(self, consume: Callable[[tarfile.TarFile], None],
+                            cached: Optional[str] = None) -> None:
+        """
+        Open the Linux VS Code tarball as a stream and pass it to consume.
+        
+        Without a cached copy the tarball is read from the network as it arrives,
+        with the raw bytes teed into the cache.
+        
+        Args:
+            consume: Called with the tarball opened in "r|" mode
+            cached: Path to a current cached download to read instead
+        """
+        if cached:
+            with tarfile.open(cached, mode="r|gz") as tf:
+                consume(tf)
+            return
+        
+        def open_tarball(tee: _TeeReader) -> None:
+            with gzip.GzipFile(fileobj=tee) as gz:
+                with tarfile.open(fileobj=gz, mode="r|") as tf:
+                    consume(tf)
+        
+        self._tee_download(open_tarball)
+    
+    def _tee_download(self, consume: Callable[[_TeeReader], None]) -> None:
+        """
+        Stream the VS Code download to consume, teeing the raw bytes into the installer cache.
+        
+        The cached copy is committed only if the whole download arrived.
+        
+        Args:
+            consume: Called with a reader over the response body
+        """
+        cache_tmp = self._new_cache_file()
+        try:
+            with self.session.get(self.download_url, stream=True) as response:
+                response.raise_for_status()
+                with open(cache_tmp, 'wb') as cache_file:
+                    tee = _TeeReader(response.raw, cache_file)
+                    consume(tee)
+                    # Read anything consume left behind, such as trailing padding, so the cached copy is complete
+                    while tee.read(DOWNLOAD_CHUNK_SIZE):
+                        pass
+                
+                expected_size = int(response.headers.get("Content-Length", 0))
+                if not expected_size or os.path.getsize(cache_tmp) == expected_size:
+                    self._commit_cache(cache_tmp, response.headers)
+        finally:
+            if os.path.exists(cache_tmp):
+                os.remove(cache_tmp)
+    
+    def _extract_settings_members(self, zip_path: str, extract_dir: str) -> None:
+        """
+        Extract only the VS Code settings files from a backup zip.
+        
+        The settings directory is chosen from the archive listing with the same
+        rules as _find_settings_dir, preferring the shallowest match. Files of
+        deduplicated backups are rebuilt from the chunk store.
+        
+        Args:
+            zip_path: Path to the backup zip
+            extract_dir: Directory to extract the selected members into
+        """
+        with zipfile.ZipFile(zip_path, 'r') as zf:
+            manifest = read_manifest(zf)
+            
+            # Group file names by their directory
+            dir_files: Dict[str, set] = {}
+            for name in (zf.namelist() if manifest is None else manifest):
+                if not name.endswith('/'):
+                    dirname, basename = posixpath.split(name)
+                    dir_files.setdefault(dirname, set()).add(basename)
+            
+            def depth(dirname: str) -> int:
+                return dirname.count('/') + 1 if dirname else 0
+            
+            settings_dirs = [
+                dirname for dirname, files in dir_files.items()
+                if "settings.json" in files and (
+                    "keybindings.json" in files or self._is_settings_dir(tuple(dirname.split('/')))
+                )
+            ]
+            extensions_dirs = [dirname for dirname, files in dir_files.items() if "extensions.txt" in files]
+            
+            members = []
+            if settings_dirs:
+                settings_dir = min(settings_dirs, key=depth)
+                prefix = f"{settings_dir}/" if settings_dir else ""
+                files = dir_files[settings_dir]
+                members.extend(
+                    prefix + name for name in ("settings.json", "keybindings.json", "extensions.json")
+                    if name in files
+                )
+                snippets_dir = prefix + "snippets"
+                members.extend(f"{snippets_dir}/{name}" for name in dir_files.get(snippets_dir, ()))
+            if extensions_dirs:
+                members.append(posixpath.join(min(extensions_dirs, key=depth), "extensions.txt"))
+            
+            logger.info(f"Extracting {len(members)} settings files from backup")
+            if manifest is None:
+                for name in members:
+                    zf.extract(name, extract_dir)
+                return
+            
+            chunks = ChunkStore()
+            root = os.path.abspath(extract_dir)
+            for name in members:
+                destination = os.path.abspath(os.path.join(root, name))
+                # Never write outside the extraction directory
+                if not destination.startswith(root + os.sep):
+                    continue
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                with open(destination, 'wb') as f:
+                    chunks.write_to(manifest[name], f)
+    
+    def _is_settings_dir(self, parts: Tuple[str, ...]) -> bool:
+        """Check whether a path, given as its components, ends with the platform settings directory"""
+        return parts[-len(self._settings_dir_parts):] == self._settings_dir_parts
+    
+    def _find_settings_dir(self, backup_dir: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Find the VS Code settings directory in a backup tree.
+        
+        Args:
+            backup_dir: Root of the extracted backup
+            
+        Returns:
+            Tuple of (settings directory, path of the first extensions.txt), either of which may be None
+        """
+        settings_dir = None
+        extensions_txt = None
+        pending = deque([backup_dir])
+        
+        while pending:
+            root = pending.popleft()
+            try:
+                with os.scandir(root) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            
+            names = {entry.name for entry in entries if entry.is_file()}
+            if extensions_txt is None and "extensions.txt" in names:
+                extensions_txt = os.path.join(root, "extensions.txt")
+            
+            if settings_dir is None and "settings.json" in names and (
+                "keybindings.json" in names or self._is_settings_dir(Path(root).parts)
+            ):
+                settings_dir = root
+                # extensions.txt is only needed when there is no extensions.json
+                if "extensions.json" in names:
+                    break
+            
+            if settings_dir and extensions_txt:
+                break
+            
+            pending.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+        
+        return settings_dir, extensions_txt
+    
     def extract_settings_from_backup(self, backup_path: str) -> Dict[str, Any]:
         """
         Extract VS Code settings from a backup file.
@@ -163,28 +895,16 @@ class VSCodePackager:
         extract_dir = os.path.join(self.temp_dir, "backup_extracted")
         os.makedirs(extract_dir, exist_ok=True)
         
-        # Extract the backup if it's a zip file
+        # Extract just the settings files if it's a zip file
         if backup_path.endswith('.zip'):
-            with zipfile.ZipFile(backup_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
+            self._extract_settings_members(backup_path, extract_dir)
             backup_dir = extract_dir
         else:
             # Assume it's already a directory
             backup_dir = backup_path
             
-        # Look for VS Code settings in the backup
-        settings_dir = None
-        
-        # Try to find the settings directory in common locations
-        for root, dirs, files in os.walk(backup_dir):
-            if "settings.json" in files and "keybindings.json" in files:
-                settings_dir = root
-                break
-                
-            # Also check for the platform-specific path
-            if self.settings_dir_template in root and "settings.json" in files:
-                settings_dir = root
-                break
+        # Look for VS Code settings (and a fallback extensions list) in one pass over the backup
+        settings_dir, extensions_txt = self._find_settings_dir(backup_dir)
                 
         if not settings_dir:
             raise ValueError("Could not find VS Code settings in the backup")
@@ -192,42 +912,36 @@ class VSCodePackager:
         # Extract settings
         settings = {}
         keybindings = []
-        snippets = {}
+        snippets = []
         extensions = []
         
         # Read settings.json
         settings_file = os.path.join(settings_dir, "settings.json")
         if os.path.exists(settings_file):
-            with open(settings_file, 'r') as f:
-                settings = json.load(f)
+            with open(settings_file, 'rb') as f:
+                settings = _loads(f.read())
                 
         # Read keybindings.json
         keybindings_file = os.path.join(settings_dir, "keybindings.json")
         if os.path.exists(keybindings_file):
-            with open(keybindings_file, 'r') as f:
-                keybindings = json.load(f)
+            with open(keybindings_file, 'rb') as f:
+                keybindings = _loads(f.read())
                 
-        # Read snippets
+        # List snippets; they are linked into the package later, never read here
         snippets_dir = os.path.join(settings_dir, "snippets")
         if os.path.exists(snippets_dir):
-            for file in os.listdir(snippets_dir):
-                if file.endswith(".json"):
-                    with open(os.path.join(snippets_dir, file), 'r') as f:
-                        snippets[file] = f.read()
+            snippets = [name for name in os.listdir(snippets_dir) if name.endswith(".json")]
                         
         # Look for extensions list
         extensions_file = os.path.join(settings_dir, "extensions.json")
         if os.path.exists(extensions_file):
-            with open(extensions_file, 'r') as f:
-                extensions_data = json.load(f)
+            with open(extensions_file, 'rb') as f:
+                extensions_data = _loads(f.read())
                 extensions = extensions_data.get("extensions", [])
-        else:
-            # Try to find extensions.txt
-            for root, dirs, files in os.walk(backup_dir):
-                if "extensions.txt" in files:
-                    with open(os.path.join(root, "extensions.txt"), 'r') as f:
-                        extensions = [line.strip() for line in f if line.strip()]
-                    break
+        elif extensions_txt:
+            # Fall back to extensions.txt
+            with open(extensions_txt, 'r') as f:
+                extensions = [line.strip() for line in f if line.strip()]
                     
         logger.info(f"Extracted settings: {len(settings)} settings, {len(keybindings)} keybindings, "
                    f"{len(snippets)} snippets, {len(extensions)} extensions")
@@ -236,6 +950,7 @@ class VSCodePackager:
             "settings": settings,
             "keybindings": keybindings,
             "snippets": snippets,
+            "snippets_dir": snippets_dir,
             "extensions": extensions,
             "settings_dir": settings_dir
         }
@@ -257,11 +972,11 @@ class VSCodePackager:
         packaged_dir = os.path.join(self.temp_dir, "vscode_packaged")
         os.makedirs(packaged_dir, exist_ok=True)
         
-        # Copy the VS Code application to the packaged directory
+        # Copy the VS Code application to the packaged directory (hard-linking its files)
         if self.system == "darwin":
             packaged_app = os.path.join(packaged_dir, self.vscode_app_name)
             logger.info(f"Copying VS Code application to {packaged_app}")
-            shutil.copytree(vscode_path, packaged_app, symlinks=True)
+            shutil.copytree(vscode_path, packaged_app, symlinks=True, copy_function=link_or_copy)
             
             # Create the user data directory within the app bundle
             # For macOS, we'll place settings in a location that VS Code will find on first launch
@@ -294,8 +1009,7 @@ class VSCodePackager:
                 f.write("# Install extensions\n")
                 f.write("echo \"Installing extensions...\"\n\n")
                 
-                for extension in settings_data["extensions"]:
-                    f.write(f"\"$CODE_EXECUTABLE_PATH\" --install-extension \"{extension}\" || echo \"Failed to install {extension}\"\n")
+                f.write(self._extension_install_lines(settings_data["extensions"], '"$CODE_EXECUTABLE_PATH"'))
                 
                 f.write("\necho \"Extensions installation complete\"\n")
             
@@ -321,19 +1035,19 @@ class VSCodePackager:
             info_plist_path = os.path.join(packaged_app, "Contents", "Info.plist")
             if os.path.exists(info_plist_path):
                 try:
-                    # This is a simplified approach - in a production environment,
-                    # you would use a proper plist library to modify the file
-                    with open(info_plist_path, 'r') as f:
-                        info_plist_content = f.read()
+                    with open(info_plist_path, 'rb') as f:
+                        data = f.read()
+                    plist = plistlib.loads(data)
+                    plist_format = plistlib.FMT_BINARY if data.startswith(b"bplist") else plistlib.FMT_XML
                     
-                    # Replace the Electron executable with our launcher script
-                    info_plist_content = info_plist_content.replace(
-                        "<string>Electron</string>",
-                        "<string>Resources/app/launcher.sh</string>"
-                    )
+                    # Point the bundle executable at our launcher script
+                    plist["CFBundleExecutable"] = "Resources/app/launcher.sh"
                     
-                    with open(info_plist_path, 'w') as f:
-                        f.write(info_plist_content)
+                    # Replace the file rather than writing through the hard link to the extracted app
+                    tmp_plist_path = info_plist_path + ".tmp"
+                    with open(tmp_plist_path, 'wb') as f:
+                        plistlib.dump(plist, f, fmt=plist_format)
+                    os.replace(tmp_plist_path, info_plist_path)
                     
                     logger.info("Modified Info.plist to use custom launcher script")
                 except Exception as e:
@@ -345,8 +1059,8 @@ class VSCodePackager:
             packaged_app = os.path.join(packaged_dir, self.vscode_app_name)
             os.makedirs(packaged_app, exist_ok=True)
             
-            # Copy the installer
-            shutil.copy2(vscode_path, os.path.join(packaged_app, "VSCodeSetup.exe"))
+            # Link the installer, copying it across filesystems
+            link_or_copy(vscode_path, os.path.join(packaged_app, "VSCodeSetup.exe"))
             
             # Create the settings directory
             settings_dir = os.path.join(packaged_app, "data", "User")
@@ -358,7 +1072,7 @@ class VSCodePackager:
             
         else:  # Linux
             packaged_app = os.path.join(packaged_dir, self.vscode_app_name)
-            shutil.copytree(vscode_path, packaged_app)
+            shutil.copytree(vscode_path, packaged_app, copy_function=link_or_copy)
             
             # Create the settings directory
             settings_dir = os.path.join(packaged_app, "data", "user-data", "User")
@@ -368,25 +1082,56 @@ class VSCodePackager:
             snippets_dir = os.path.join(settings_dir, "snippets")
             os.makedirs(snippets_dir, exist_ok=True)
             
+        self._write_user_settings(settings_dir, snippets_dir, settings_data)
+            
+        logger.info(f"Settings merged into VS Code at {packaged_app}")
+        return packaged_app
+    
+    def _write_user_settings(self, settings_dir: str, snippets_dir: str, settings_data: Dict[str, Any]) -> None:
+        """
+        Write the settings, keybindings, snippets and extensions list into a VS Code User directory.
+        
+        Args:
+            settings_dir: Existing User directory to write into
+            snippets_dir: Existing snippets directory to link the snippets into
+            settings_data: Dictionary containing settings, keybindings, snippets, and extensions
+        """
         # Write settings.json
-        with open(os.path.join(settings_dir, "settings.json"), 'w') as f:
-            json.dump(settings_data["settings"], f, indent=2)
+        with open(os.path.join(settings_dir, "settings.json"), 'wb') as f:
+            f.write(_dumps_pretty(settings_data["settings"]))
             
         # Write keybindings.json
-        with open(os.path.join(settings_dir, "keybindings.json"), 'w') as f:
-            json.dump(settings_data["keybindings"], f, indent=2)
+        with open(os.path.join(settings_dir, "keybindings.json"), 'wb') as f:
+            f.write(_dumps_pretty(settings_data["keybindings"]))
             
-        # Write snippets
-        for filename, content in settings_data["snippets"].items():
-            with open(os.path.join(snippets_dir, filename), 'w') as f:
-                f.write(content)
+        # Link snippets from the backup, copying them across filesystems
+        for filename in settings_data["snippets"]:
+            link_or_copy(os.path.join(settings_data["snippets_dir"], filename),
+                         os.path.join(snippets_dir, filename))
                 
         # Write extensions list
-        with open(os.path.join(settings_dir, "extensions.json"), 'w') as f:
-            json.dump({"extensions": settings_data["extensions"]}, f, indent=2)
-            
-        logger.info(f"Settings merged into VS Code at {packaged_app}")
-        return packaged_app
+        self._write_extensions_json(os.path.join(settings_dir, "extensions.json"), settings_data["extensions"])
+    
+    @staticmethod
+    def _write_extensions_json(path: str, extensions: List[str]) -> None:
+        """
+        Write {"extensions": [...]} one entry per line, without building the whole document in memory.
+        
+        Args:
+            path: Path of the extensions.json file to write
+            extensions: Extension identifiers
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            if not extensions:
+                f.write('{\n  "extensions": []\n}')
+                return
+            f.write('{\n  "extensions": [\n')
+            last = len(extensions) - 1
+            f.writelines(
+                f'    {json.dumps(extension, ensure_ascii=False)}{"," if i < last else ""}\n'
+                for i, extension in enumerate(extensions)
+            )
+            f.write('  ]\n}')
     
     def _create_setup_script(self, packaged_dir: str, settings_data: Dict[str, Any]) -> None:
         """
@@ -406,17 +1151,28 @@ class VSCodePackager:
             script_path = os.path.join(packaged_dir, "setup.sh")
             script_content = self._get_linux_setup_script(settings_data["extensions"])
             
-        with open(script_path, 'w') as f:
-            f.write(script_content)
-            
-        # Make the script executable
-        os.chmod(script_path, 0o755)
+        # Write the encoded script in one go, created executable
+        fd = os.open(script_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o755)
+        try:
+            view = memoryview(script_content)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
         
         logger.info(f"Created setup script at {script_path}")
     
-    def _get_macos_setup_script(self, extensions: List[str]) -> str:
-        """Get the macOS setup script content"""
-        script = """#!/bin/bash
+    @staticmethod
+    def _extension_install_lines(extensions: List[str], command: str = "code") -> str:
+        """Get the script commands that install the extensions, up to EXTENSION_INSTALL_BATCH per CLI launch"""
+        lines = []
+        for start in range(0, len(extensions), EXTENSION_INSTALL_BATCH):
+            batch = extensions[start:start + EXTENSION_INSTALL_BATCH]
+            args = " ".join(f'--install-extension "{extension}"' for extension in batch)
+            lines.append(f'{command} {args} || echo "Failed to install some of: {", ".join(batch)}"\n')
+        return "".join(lines)
+    
+    _MACOS_SETUP_SCRIPT = _ScriptTemplate("""#!/bin/bash
 
 # VS Code Setup Script
 echo "=== VS Code Setup with Custom Settings ==="
@@ -467,22 +1223,18 @@ cp -R "$SETTINGS_DIR/snippets/"* "$VS_CODE_USER_DIR/snippets/"
 
 # Install extensions
 echo "Installing extensions..."
-"""
-
-        for extension in extensions:
-            script += f'code --install-extension "{extension}" || echo "Failed to install {extension}"\n'
-
-        script += """
+@{extensions_block}
 echo "=== Setup completed successfully! ==="
 echo "VS Code is now configured with all your custom settings and extensions."
 echo "Press any key to exit..."
 read -n 1
-"""
-        return script
+""")
     
-    def _get_windows_setup_script(self, extensions: List[str]) -> str:
-        """Get the Windows setup script content"""
-        script = """@echo off
+    def _get_macos_setup_script(self, extensions: List[str]) -> bytes:
+        """Get the macOS setup script content as UTF-8 with Unix line endings"""
+        return self._MACOS_SETUP_SCRIPT.substitute(extensions_block=self._extension_install_lines(extensions)).encode("utf-8")
+    
+    _WINDOWS_SETUP_SCRIPT = _ScriptTemplate("""@echo off
 echo === VS Code Setup with Custom Settings ===
 echo This script will configure VS Code with your custom settings and extensions
 
@@ -525,22 +1277,19 @@ xcopy "%SETTINGS_DIR%\\snippets\\*" "%VS_CODE_USER_DIR%\\snippets\\" /E /Y
 
 REM Install extensions
 echo Installing extensions...
-"""
-
-        for extension in extensions:
-            script += f'code --install-extension "{extension}" || echo "Failed to install {extension}"\n'
-
-        script += """
+@{extensions_block}
 echo === Setup completed successfully! ===
 echo VS Code is now configured with all your custom settings and extensions.
 echo Press any key to exit...
 pause
-"""
-        return script
+""")
+    
+    def _get_windows_setup_script(self, extensions: List[str]) -> bytes:
+        """Get the Windows setup script content as UTF-8 with CRLF line endings"""
+        script = self._WINDOWS_SETUP_SCRIPT.substitute(extensions_block=self._extension_install_lines(extensions))
+        return script.replace("\n", "\r\n").encode("utf-8")
     
-    def _get_linux_setup_script(self, extensions: List[str]) -> str:
-        """Get the Linux setup script content"""
-        script = """#!/bin/bash
+    _LINUX_SETUP_SCRIPT = _ScriptTemplate("""#!/bin/bash
 
 # VS Code Setup Script
 echo "=== VS Code Setup with Custom Settings ==="
@@ -607,18 +1356,16 @@ cp -R "$SETTINGS_DIR/snippets/"* "$VS_CODE_USER_DIR/snippets/"
 
 # Install extensions
 echo "Installing extensions..."
-"""
-
-        for extension in extensions:
-            script += f'code --install-extension "{extension}" || echo "Failed to install {extension}"\n'
-
-        script += """
+@{extensions_block}
 echo "=== Setup completed successfully! ==="
 echo "VS Code is now configured with all your custom settings and extensions."
 echo "Press any key to exit..."
 read -n 1
-"""
-        return script
+""")
+    
+    def _get_linux_setup_script(self, extensions: List[str]) -> bytes:
+        """Get the Linux setup script content as UTF-8 with Unix line endings"""
+        return self._LINUX_SETUP_SCRIPT.substitute(extensions_block=self._extension_install_lines(extensions)).encode("utf-8")
     
     def package_vscode(self, vscode_path: str) -> str:
         """
@@ -670,10 +1417,10 @@ read -n 1
             staging_dir = os.path.join(self.temp_dir, "dmg_staging")
             os.makedirs(staging_dir, exist_ok=True)
             
-            # Copy the VS Code application to the staging directory
+            # Copy the VS Code application to the staging directory (hard-linking its files)
             vscode_app_path = os.path.join(staging_dir, self.vscode_app_name)
             logger.info(f"Copying VS Code application to staging directory: {vscode_app_path}")
-            shutil.copytree(app_path, vscode_app_path, symlinks=True)
+            shutil.copytree(app_path, vscode_app_path, symlinks=True, copy_function=link_or_copy)
             
             # Create a symbolic link to /Applications in the staging directory
             applications_link = os.path.join(staging_dir, "Applications")
@@ -692,67 +1439,25 @@ read -n 1
                         "This version of VS Code already includes your settings, keybindings, and snippets.\n"
                         "Your extensions will be automatically installed on first launch.")
             
-            # Create a temporary DMG
-            temp_dmg = os.path.join(self.temp_dir, "temp.dmg")
-            logger.info(f"Creating temporary DMG at {temp_dmg}")
-            
-            # Use hdiutil to create the DMG
+            # Create the compressed, read-only DMG directly; nothing needs to be customized on a mounted image
+            if _LZFSE_SUPPORTED and not self.legacy_compat:
+                format_args = _DMG_ULFO_ARGS
+            else:
+                format_args = _DMG_UDZO_ARGS + ["-imagekey", f"zlib-level={self.compresslevel}"]
             create_cmd = [
                 "hdiutil", "create",
                 "-volname", "VS Code with Settings",
                 "-srcfolder", staging_dir,
-                "-ov", "-format", "UDRW",
-                temp_dmg
+                # Skip building a Spotlight index of the temporary volume
+                "-nospotlight",
+                "-ov", *format_args,
+                dmg_path
             ]
             
             logger.info(f"Running command: {' '.join(create_cmd)}")
             result = subprocess.run(create_cmd, check=True, capture_output=True, text=True)
             logger.info(f"hdiutil create output: {result.stdout}")
             
-            # Create a mount point for the DMG
-            mount_point = os.path.join(self.temp_dir, "dmg_mount")
-            os.makedirs(mount_point, exist_ok=True)
-            
-            # Mount the DMG to customize it
-            mount_cmd = [
-                "hdiutil", "attach", temp_dmg,
-                "-mountpoint", mount_point,
-                "-noautoopen"
-            ]
-            
-            logger.info(f"Running command: {' '.join(mount_cmd)}")
-            result = subprocess.run(mount_cmd, check=True, capture_output=True, text=True)
-            logger.info(f"hdiutil attach output: {result.stdout}")
-            
-            try:
-                # Create a .DS_Store file to customize the DMG window appearance
-                # This is optional and can be expanded with more customization
-                
-                # Detach the DMG
-                detach_cmd = ["hdiutil", "detach", mount_point, "-force"]
-                logger.info(f"Running command: {' '.join(detach_cmd)}")
-                result = subprocess.run(detach_cmd, check=True, capture_output=True, text=True)
-                logger.info(f"hdiutil detach output: {result.stdout}")
-            except Exception as e:
-                logger.error(f"Error customizing DMG: {e}")
-                # Try to detach if an error occurred
-                try:
-                    subprocess.run(["hdiutil", "detach", mount_point, "-force"], check=False)
-                except:
-                    pass
-            
-            # Convert the DMG to compressed format
-            convert_cmd = [
-                "hdiutil", "convert",
-                temp_dmg,
-                "-format", "UDZO",
-                "-o", dmg_path
-            ]
-            
-            logger.info(f"Running command: {' '.join(convert_cmd)}")
-            result = subprocess.run(convert_cmd, check=True, capture_output=True, text=True)
-            logger.info(f"hdiutil convert output: {result.stdout}")
-            
             # Check if the final DMG was created
             if not os.path.exists(dmg_path):
                 logger.error(f"Failed to create final DMG at {dmg_path}")
@@ -772,14 +1477,6 @@ read -n 1
         except Exception as e:
             logger.exception(f"Unexpected error creating DMG: {e}")
             return self._create_zip_package(app_path, output_dir)
-        finally:
-            # Clean up temporary DMG
-            if os.path.exists(temp_dmg):
-                try:
-                    os.remove(temp_dmg)
-                    logger.info(f"Removed temporary DMG: {temp_dmg}")
-                except Exception as e:
-                    logger.warning(f"Failed to remove temporary DMG: {e}")
     
     def _create_windows_package(self, app_path: str, output_dir: str) -> str:
         """
@@ -792,8 +1489,8 @@ read -n 1
         Returns:
             Path to the created package
         """
-        # For Windows, we'll create a ZIP file
-        return self._create_zip_package(app_path, output_dir)
+        # For Windows, we'll create a ZIP file; the installer is already LZMA-compressed, so it is stored as-is
+        return self._create_zip_package(app_path, output_dir, ZIP_STORED_SUFFIXES + (".exe",))
     
     def _create_linux_package(self, app_path: str, output_dir: str) -> str:
         """
@@ -808,45 +1505,192 @@ read -n 1
         """
         # For Linux, we'll create a tarball
         tar_path = os.path.join(output_dir, "VSCode_with_Settings.tar.gz")
-        
+        tar_cmd = ["tar", "-cf", "-", "-C", os.path.dirname(app_path), os.path.basename(app_path)]
+        gzip_cmd = _gzip_command(self.compresslevel)
+
         try:
-            subprocess.run([
-                "tar", "-czf", tar_path, "-C", os.path.dirname(app_path), os.path.basename(app_path)
-            ], check=True)
-            
+            # Chain tar into the compressor by a pipe so the uncompressed stream never touches disk
+            with open(tar_path, 'wb') as out:
+                tar_p = subprocess.Popen(tar_cmd, stdout=subprocess.PIPE)
+                gzip_p = subprocess.Popen(gzip_cmd, stdin=tar_p.stdout, stdout=out)
+                # Only the compressor holds the read end now, so tar sees SIGPIPE if it exits early
+                tar_p.stdout.close()
+                gzip_returncode = gzip_p.wait()
+                tar_returncode = tar_p.wait()
+            if tar_returncode:
+                raise subprocess.CalledProcessError(tar_returncode, tar_cmd)
+            if gzip_returncode:
+                raise subprocess.CalledProcessError(gzip_returncode, gzip_cmd)
+
             logger.info(f"Created tarball at {tar_path}")
             return tar_path
-        except subprocess.CalledProcessError as e:
+        except (subprocess.CalledProcessError, OSError) as e:
             logger.error(f"Failed to create tarball: {e}")
             
             # Fall back to creating a ZIP file
             logger.info("Falling back to creating a ZIP file")
             return self._create_zip_package(app_path, output_dir)
     
-    def _create_zip_package(self, app_path: str, output_dir: str) -> str:
+    def _stream_linux_package(self, settings_data: Dict[str, Any]) -> str:
+        """
+        Build the Linux tarball straight from the VS Code download, without extracting it.
+        
+        Each member of the download is re-archived under the packaged app name as it
+        is read, then the user settings are appended; the output is compressed by the
+        _gzip_command process.
+        
+        Args:
+            settings_data: Dictionary containing settings, keybindings, snippets, and extensions
+            
+        Returns:
+            Path to the created tarball
+        """
+        output_dir = os.path.join(self.temp_dir, "output")
+        os.makedirs(output_dir, exist_ok=True)
+        tar_path = os.path.join(output_dir, "VSCode_with_Settings.tar.gz")
+        
+        # Only the settings files are staged on disk, laid out as in the packaged app
+        data_dir = os.path.join(self.temp_dir, "linux_settings", "data")
+        settings_dir = os.path.join(data_dir, "user-data", "User")
+        snippets_dir = os.path.join(settings_dir, "snippets")
+        os.makedirs(snippets_dir, exist_ok=True)
+        self._write_user_settings(settings_dir, snippets_dir, settings_data)
+        
+        def rename(name: str) -> str:
+            head, sep, rest = name.partition("/")
+            return self.vscode_app_name + sep + rest if head == "VSCode-linux-x64" else name
+        
+        def repack(src: tarfile.TarFile, out) -> None:
+            with tarfile.open(fileobj=out, mode="w|") as dst:
+                for member in src:
+                    # Drop PAX path records so the renamed paths are the ones written
+                    member.pax_headers.pop("path", None)
+                    member.name = rename(member.name)
+                    if member.islnk():
+                        member.pax_headers.pop("linkpath", None)
+                        member.linkname = rename(member.linkname)
+                    dst.addfile(member, src.extractfile(member) if member.isfile() else None)
+                dst.add(data_dir, arcname=f"{self.vscode_app_name}/data")
+        
+        cached = self._cached_download()
+        logger.info(f"Streaming VS Code from {cached or self.download_url} into {tar_path}")
+        gzip_cmd = _gzip_command(self.compresslevel)
+        with open(tar_path, 'wb') as f:
+            # Compressing in a child process keeps it off the thread doing the re-archiving
+            gzip_p = subprocess.Popen(gzip_cmd, stdin=subprocess.PIPE, stdout=f)
+            try:
+                self._read_linux_tarball(lambda src: repack(src, gzip_p.stdin), cached)
+            finally:
+                gzip_p.stdin.close()
+                gzip_returncode = gzip_p.wait()
+            if gzip_returncode:
+                raise subprocess.CalledProcessError(gzip_returncode, gzip_cmd)
+        
+        logger.info(f"Created tarball at {tar_path}")
+        return tar_path
+    
+    def _create_zip_package(self, app_path: str, output_dir: str,
+                            stored_suffixes: Tuple[str, ...] = ZIP_STORED_SUFFIXES) -> str:
         """
         Create a ZIP package.
         
         Args:
             app_path: Path to the VS Code application directory
             output_dir: Directory to save the ZIP file
+            stored_suffixes: Extensions of already-compressed files to store without deflating
             
         Returns:
             Path to the created ZIP file
         """
         zip_path = os.path.join(output_dir, "VSCode_with_Settings.zip")
-        
-        # Create a ZIP file
-        shutil.make_archive(
-            os.path.splitext(zip_path)[0],  # Remove .zip extension
-            'zip',
-            os.path.dirname(app_path),
-            os.path.basename(app_path)
-        )
-        
+
+        # zip -r adds to an existing archive instead of replacing it
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+
+        # Prefer the native archivers; ditto also keeps resource forks in .app bundles
+        ditto = shutil.which("ditto") if self.system == "darwin" else None
+        zip_tool = shutil.which("zip")
+        if ditto:
+            cmd = [ditto, "-c", "-k", "--sequesterRsrc", "--keepParent",
+                   "--zlibCompressionLevel", str(self.compresslevel), app_path, zip_path]
+            cwd = None
+        elif zip_tool:
+            cmd = [zip_tool, "-r", "-q", "-y", f"-{self.compresslevel}", "-n", ":".join(stored_suffixes),
+                   zip_path, os.path.basename(app_path)]
+            cwd = os.path.dirname(os.path.abspath(app_path))
+        else:
+            cmd = None
+
+        if cmd:
+            try:
+                subprocess.run(cmd, cwd=cwd, check=True, capture_output=True)
+                logger.info(f"Created ZIP at {zip_path}")
+                return zip_path
+            except (subprocess.CalledProcessError, OSError) as e:
+                logger.warning(f"{os.path.basename(cmd[0])} failed, creating ZIP in Python instead: {e}")
+                if os.path.exists(zip_path):
+                    os.remove(zip_path)
+
+        # Create a ZIP file in Python
+        _zip_tree(app_path, zip_path, self.compresslevel, stored_suffixes)
+
         logger.info(f"Created ZIP at {zip_path}")
         return zip_path
     
+    def _prepare(self, backup_path: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Run the download-bound steps of packaging: read the backup, then fetch VS Code and merge the settings into it.
+        
+        Args:
+            backup_path: Path to the backup file or directory
+            
+        Returns:
+            Tuple of (path to the modified VS Code application, settings data); the path is
+            None on Linux, where the download is streamed into the package by _finalize
+        """
+        # Extract settings from backup
+        logger.info("Extracting settings from backup")
+        settings_data = self.extract_settings_from_backup(backup_path)
+        
+        if self.system == "linux":
+            return None, settings_data
+        
+        # Download and extract VS Code
+        logger.info("Downloading and extracting VS Code")
+        vscode_path = self.download_and_extract()
+        
+        # Merge settings into VS Code
+        logger.info("Merging settings into VS Code")
+        return self.merge_settings_into_vscode(vscode_path, settings_data), settings_data
+    
+    def _finalize(self, modified_vscode: Optional[str], settings_data: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Run the compression-bound step of packaging on the output of _prepare.
+        
+        Returns:
+            Tuple of (path to the packaged VS Code application, file type)
+        """
+        logger.info("Packaging VS Code")
+        if modified_vscode is None:
+            # The tarball is re-packed with the settings as it streams in
+            package_path = self._stream_linux_package(settings_data)
+        else:
+            package_path = self.package_vscode(modified_vscode)
+        
+        # Determine file type based on the package path
+        if package_path.endswith('.dmg'):
+            file_type = 'dmg'
+        elif package_path.endswith('.zip'):
+            file_type = 'zip'
+        elif package_path.endswith('.tar.gz'):
+            file_type = 'tar.gz'
+        else:
+            file_type = 'unknown'
+        
+        logger.info(f"VS Code package created successfully at {package_path} (type: {file_type})")
+        return package_path, file_type
+    
     def create_vscode_package(self, backup_path: str) -> Tuple[str, str]:
         """
         Create a VS Code package with settings from a backup.
@@ -859,40 +1703,46 @@ read -n 1
         """
         try:
             logger.info(f"Starting VS Code packaging process for backup: {backup_path}")
-            
-            # Download VS Code
-            logger.info("Downloading VS Code")
-            vscode_download = self.download_vscode()
-            
-            # Extract VS Code
-            logger.info("Extracting VS Code")
-            vscode_path = self.extract_vscode(vscode_download)
-            
-            # Extract settings from backup
-            logger.info("Extracting settings from backup")
-            settings_data = self.extract_settings_from_backup(backup_path)
-            
-            # Merge settings into VS Code
-            logger.info("Merging settings into VS Code")
-            modified_vscode = self.merge_settings_into_vscode(vscode_path, settings_data)
-            
-            # Package VS Code
-            logger.info("Packaging VS Code")
-            package_path = self.package_vscode(modified_vscode)
-            
-            # Determine file type based on the package path
-            if package_path.endswith('.dmg'):
-                file_type = 'dmg'
-            elif package_path.endswith('.zip'):
-                file_type = 'zip'
-            elif package_path.endswith('.tar.gz'):
-                file_type = 'tar.gz'
-            else:
-                file_type = 'unknown'
-            
-            logger.info(f"VS Code package created successfully at {package_path} (type: {file_type})")
-            return package_path, file_type
-            
+            return self._finalize(*self._prepare(backup_path))
         except Exception as e:
             logger.exception(f"Failed to create VS Code package: {e}")
-            raise 
\ No newline at end of file
+            raise
+    
+    def create_many(self, backup_paths: List[str]) -> List[Tuple[str, str]]:
+        """
+        Create a VS Code package for each of several backups, overlapping their stages.
+        
+        Each backup is prepared while the previous one is still being packaged on a
+        worker thread, which mostly waits on hdiutil, zip or gzip. Every backup gets its
+        own working directory under this packager's temporary directory.
+        
+        Args:
+            backup_paths: Paths to the backup files or directories
+            
+        Returns:
+            List of (path to the packaged VS Code application, file type), in the order of backup_paths
+        """
+        results = []
+        jobs = []
+        try:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                pending = None
+                for i, backup_path in enumerate(backup_paths):
+                    logger.info(f"Starting VS Code packaging process for backup: {backup_path}")
+                    job = VSCodePackager(os.path.join(self.temp_dir, f"package_{i}"),
+                                         legacy_compat=self.legacy_compat, compresslevel=self.compresslevel)
+                    jobs.append(job)
+                    prepared = job._prepare(backup_path)
+                    if pending is not None:
+                        results.append(pending.result())
+                    pending = executor.submit(job._finalize, *prepared)
+                if pending is not None:
+                    results.append(pending.result())
+        except Exception as e:
+            logger.exception(f"Failed to create VS Code packages: {e}")
+            raise
+        finally:
+            # The job directories live under temp_dir; only their HTTP connections are closed here
+            for job in jobs:
+                job.cleanup()
+        return results
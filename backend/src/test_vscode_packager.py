@@ -4,15 +4,20 @@ import os
 import sys
 import argparse
 import logging
+import shutil
 from system_sync.vscode_packager import VSCodePackager
+from system_sync.fs_utils import copy_file
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def main():
     parser = argparse.ArgumentParser(description='Test VS Code packager')
-    parser.add_argument('backup_path', help='Path to the backup file or directory')
+    parser.add_argument('backup_paths', nargs='+', metavar='backup_path',
+                        help='Path to a backup file or directory; several are packaged in an overlapped batch')
     parser.add_argument('--output-dir', '-o', help='Output directory for the packaged VS Code', default='./output')
+    parser.add_argument('--compresslevel', type=int, choices=range(1, 10), default=1,
+                        help='Compression level for the package, 1 (fastest) to 9 (smallest)')
     
     args = parser.parse_args()
     
@@ -20,25 +25,33 @@ def main():
     os.makedirs(args.output_dir, exist_ok=True)
     
     try:
-        logger.info(f"Testing VS Code packager with backup: {args.backup_path}")
+        logger.info(f"Testing VS Code packager with backups: {', '.join(args.backup_paths)}")
         
-        # Create the packager
-        packager = VSCodePackager()
+        # Create the packager; its temporary directory is removed on exit
+        with VSCodePackager(compresslevel=args.compresslevel) as packager:
+            # Create the packages
+            if len(args.backup_paths) == 1:
+                packages = [packager.create_vscode_package(args.backup_paths[0])]
+            else:
+                packages = packager.create_many(args.backup_paths)
+            
+            output_paths = []
+            for backup_path, (package_path, _) in zip(args.backup_paths, packages):
+                # Every package has the same name, so name each of a batch after its backup
+                output_name = os.path.basename(package_path)
+                if len(args.backup_paths) > 1:
+                    backup_name = os.path.splitext(os.path.basename(os.path.normpath(backup_path)))[0]
+                    output_name = f"{backup_name}_{output_name}"
+                output_path = os.path.join(args.output_dir, output_name)
+                
+                logger.info(f"Package created at: {package_path}")
+                logger.info(f"Moving to output directory: {output_path}")
+                
+                # Rename within a filesystem; otherwise clone or copy it, since the temporary directory is removed anyway
+                shutil.move(package_path, output_path, copy_function=copy_file)
+                output_paths.append(output_path)
         
-        # Create the package
-        package_path = packager.create_vscode_package(args.backup_path)
-        
-        # Copy the package to the output directory
-        output_path = os.path.join(args.output_dir, os.path.basename(package_path))
-        
-        logger.info(f"Package created at: {package_path}")
-        logger.info(f"Copying to output directory: {output_path}")
-        
-        # Copy the package
-        import shutil
-        shutil.copy2(package_path, output_path)
-        
-        logger.info(f"Test completed successfully. Package available at: {output_path}")
+        logger.info(f"Test completed successfully. Packages available at: {', '.join(output_paths)}")
         return 0
         
     except Exception as e:
@@ -0,0 +1,7 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    """Point the home directory, where storage, the database and chunks live, at a temporary directory."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return tmp_path
@@ -0,0 +1,41 @@
+from app_handler import AppHandler
+
+def test_has_entry_ignores_case_where_the_filesystem_does(tmp_path):
+    (tmp_path / "Code").mkdir()
+    handler = AppHandler()
+
+    handler._fold_case = True
+    handler.invalidate_entry_cache()
+    assert handler._has_entry(str(tmp_path), "code")
+    assert handler._has_entry(str(tmp_path), "CODE")
+
+    handler._fold_case = False
+    handler.invalidate_entry_cache()
+    assert handler._has_entry(str(tmp_path), "Code")
+    assert not handler._has_entry(str(tmp_path), "code")
+
+def test_has_entry_scans_each_directory_once(tmp_path):
+    handler = AppHandler()
+    assert not handler._has_entry(str(tmp_path), "Code")
+    (tmp_path / "Code").mkdir()
+    # The cached listing is used until invalidated
+    assert not handler._has_entry(str(tmp_path), "Code")
+    handler.invalidate_entry_cache()
+    assert handler._has_entry(str(tmp_path), "Code")
+
+def test_settings_trees_round_trip(home, monkeypatch):
+    monkeypatch.setattr("platform.system", lambda: "Linux")
+    settings_dir = home / ".config" / "MyApp"
+    (settings_dir / "profiles").mkdir(parents=True)
+    (settings_dir / "config.json").write_bytes(b'{"theme": "dark"}')
+    (settings_dir / "profiles" / "default.json").write_bytes(b'{}' * 10000)
+    handler = AppHandler()
+
+    backup_paths = handler.backup_app_settings("MyApp", str(home / "backup"))
+    backup_dir = home / "backup" / "MyApp" / "app_support"
+    assert backup_paths == {"app_support": str(backup_dir)}
+    assert (backup_dir / "profiles" / "default.json").read_bytes() == b'{}' * 10000
+
+    (settings_dir / "config.json").write_bytes(b'{}')
+    assert handler.restore_app_settings("MyApp", str(home / "backup"))
+    assert (settings_dir / "config.json").read_bytes() == b'{"theme": "dark"}'
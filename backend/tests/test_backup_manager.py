@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+import os
+import queue
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+
+from system_sync import backup_manager
+from system_sync.backup_manager import BackupManager
+from system_sync.chunk_store import MANIFEST_NAME
+
+@pytest.fixture(autouse=True)
+def distinct_timestamps(monkeypatch):
+    """Give each backup its own second, since backup file names are timestamped to the second."""
+    seconds = itertools.count()
+    start = datetime(2024, 1, 1)
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return start + timedelta(seconds=next(seconds))
+
+    monkeypatch.setattr(backup_manager, "datetime", FakeDatetime)
+
+def _chunk_files(root):
+    return {name for _, _, files in os.walk(root) for name in files if name != '.lock'}
+
+@pytest.fixture
+def settings_dir(home):
+    path = home / "settings"
+    (path / "snippets").mkdir(parents=True)
+    (path / "settings.json").write_bytes(b'{"editor.fontSize": 14}' * 10000)
+    (path / "snippets" / "py.json").write_bytes(b'{}')
+    (path / "empty.txt").write_bytes(b'')
+    return path
+
+def test_dedup_backup_round_trip(settings_dir, tmp_path):
+    async def run():
+        manager = BackupManager()
+        settings = [{'path': str(settings_dir), 'type': 'config'}]
+        assert await manager.create_backup("App", settings, dedup=True)
+        chunks_after_first = _chunk_files(manager.chunks.root)
+        assert await manager.create_backup("App", settings, dedup=True)
+        # Unchanged files add no new chunks
+        assert _chunk_files(manager.chunks.root) == chunks_after_first
+
+        backups = (await manager.list_backups())["App"]
+        backup_info = await manager.get_backup(backups[0]['id'])
+        with zipfile.ZipFile(backup_info['storage_path']) as zf:
+            assert zf.namelist() == [MANIFEST_NAME]
+
+        # Exports rebuild the real files
+        exported = tmp_path / "export.zip"
+        assert await manager.export_backup(backup_info, str(exported))
+        with zipfile.ZipFile(exported) as zf:
+            assert zf.read("config/settings/settings.json") == (settings_dir / "settings.json").read_bytes()
+            assert zf.read("config/settings/empty.txt") == b''
+
+        # Restores rebuild them too
+        original = (settings_dir / "settings.json").read_bytes()
+        (settings_dir / "settings.json").unlink()
+        assert await manager.restore_backup(backup_info['id'])
+        assert (settings_dir / "settings.json").read_bytes() == original
+
+        # Chunks are reclaimed once no backup references them
+        assert await manager.delete_backup(backups[0]['id'])
+        assert _chunk_files(manager.chunks.root) == chunks_after_first
+        assert await manager.delete_backup(backups[1]['id'])
+        assert _chunk_files(manager.chunks.root) == set()
+
+    asyncio.run(run())
+
+def test_chunk_collection_waits_for_backups_in_progress(settings_dir):
+    async def run():
+        manager = BackupManager()
+        settings = [{'path': str(settings_dir), 'type': 'config'}]
+        assert await manager.create_backup("App", settings, dedup=True)
+        lock = manager.chunks.lock_shared()
+        try:
+            assert manager.chunks.collect_garbage(set()) == 0
+        finally:
+            lock.close()
+        assert _chunk_files(manager.chunks.root)
+
+    asyncio.run(run())
+
+def test_backup_process_reports_failure_when_backup_raises(monkeypatch):
+    def broken_manager():
+        raise RuntimeError("storage unavailable")
+
+    monkeypatch.setattr(backup_manager, "BackupManager", broken_manager)
+    progress = queue.Queue()
+    with pytest.raises(RuntimeError):
+        backup_manager.run_backup_process("App", [], progress)
+    assert progress.get_nowait() == ("App", 0, "failed")
+
+def test_listing_evicts_backups_deleted_elsewhere(settings_dir):
+    async def run():
+        manager = BackupManager()
+        settings = [{'path': str(settings_dir), 'type': 'config'}]
+        assert await manager.create_backup("App", settings)
+        assert await manager.create_backup("Other", settings)
+        listing = await manager.list_backups()
+        app_id, other_id = listing["App"][0]['id'], listing["Other"][0]['id']
+        assert await manager.get_backup(app_id)
+
+        # Deleted behind the manager's back, then noticed by an app listing
+        assert await manager.storage.delete_backup(app_id)
+        assert not (await manager.list_backups("App")).get("App")
+        assert await manager.get_backup(app_id) is None
+        # Other apps' entries survive a single app's listing
+        assert other_id in manager._by_id
+
+        assert await manager.delete_backup(other_id)
+        assert other_id not in manager._by_id
+        assert await manager.get_backup(other_id) is None
+
+    asyncio.run(run())
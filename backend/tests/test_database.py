@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from system_sync.database import Database
+
+def _rows(home, count, app_count=2):
+    return [
+        {
+            'app': {
+                'name': f"App{i % app_count}",
+                'path': str(home / f"app{i % app_count}"),
+                'category': 'Development',
+                'type': 'Application',
+                'size': 10,
+                'settings': [],
+            },
+            'filename': f"backup{i}.zip",
+            'storage_path': str(home / f"backup{i}.zip"),
+            'size': 10,
+            'metadata': {'timestamp': str(i)},
+        }
+        for i in range(count)
+    ]
+
+def test_add_backups_bulk_commits_once(home):
+    db = Database(str(home / "test.db"))
+    statements = []
+    db._conn.set_trace_callback(statements.append)
+
+    assert db.add_backups_bulk(_rows(home, 50))
+
+    db._conn.set_trace_callback(None)
+    assert statements.count('BEGIN') == 1
+    assert statements.count('COMMIT') == 1
+    backups = db.get_backups()
+    assert len(backups) == 50
+    assert {backup['app_name'] for backup in backups} == {"App0", "App1"}
+    assert len(db.get_applications()) == 2
+    db.close()
+
+def test_add_backups_bulk_writes_nothing_on_failure(home):
+    db = Database(str(home / "test.db"))
+    rows = _rows(home, 3)
+    # A duplicate storage path fails the insert after the applications were upserted
+    rows[2]['storage_path'] = rows[0]['storage_path']
+
+    assert not db.add_backups_bulk(rows)
+
+    assert db.get_backups() == []
+    assert db.get_applications() == []
+    db.close()
+
+def test_aclose_flushes_queued_writes(home):
+    db = Database(str(home / "test.db"))
+    assert db.add_backups_bulk(_rows(home, 3))
+    backup_ids = [backup['id'] for backup in db.get_backups()]
+
+    async def run():
+        writes = [asyncio.create_task(db.submit_write('delete_backup', backup_id)) for backup_id in backup_ids]
+        await asyncio.sleep(0)
+        await db.aclose()
+        return await asyncio.gather(*writes)
+
+    assert asyncio.run(run()) == [True, True, True]
+    assert db._writer_task is None
+    db = Database(str(home / "test.db"))
+    assert db.get_backups() == []
+    db.close()
+
+def test_writes_queued_on_another_loop_are_failed(home):
+    db = Database(str(home / "test.db"))
+    assert db.add_backups_bulk(_rows(home, 1))
+    backup_id = db.get_backups()[0]['id']
+    first_loop = asyncio.new_event_loop()
+
+    async def enqueue():
+        write = asyncio.create_task(db.submit_write('mark_restored', backup_id))
+        # Let the write reach the queue, but stop before the writer flushes it
+        await asyncio.sleep(0)
+        return write
+
+    try:
+        write = first_loop.run_until_complete(enqueue())
+        # Starting a writer on a new loop fails the write stranded on the old one
+        assert asyncio.run(db.submit_write('delete_backup', backup_id))
+        with pytest.raises(RuntimeError):
+            first_loop.run_until_complete(write)
+    finally:
+        first_loop.close()
+    db.close()
+
+def test_listings_return_parsed_plain_dicts(home):
+    db = Database(str(home / "test.db"))
+    rows = _rows(home, 2)
+    rows[0]['app']['settings'] = [{'path': '/tmp/settings', 'type': 'config'}]
+    assert db.add_backups_bulk(rows)
+
+    for backup in db.get_backups():
+        assert type(backup) is dict
+        # Copies see the parsed JSON, the same as get_backup
+        assert {**backup}['metadata'] == db.get_backup(backup['id'])['metadata']
+    settings = {app['name']: app['settings'] for app in db.get_applications()}
+    assert settings['App0'] == [{'path': '/tmp/settings', 'type': 'config'}]
+    db.close()
@@ -0,0 +1,52 @@
+import asyncio
+import hashlib
+import os
+
+from system_sync.local_storage import LocalStorage
+
+def _make_files(home, count):
+    paths = []
+    for i in range(count):
+        path = home / f"backup{i}.zip"
+        path.write_bytes(b"backup %d" % i)
+        paths.append(str(path))
+    return paths
+
+def test_upload_backups_bulk_records_hashes(home):
+    storage = LocalStorage()
+    paths = _make_files(home, 3)
+    uploads = [(f"App{i % 2}", path, {'timestamp': str(i)}) for i, path in enumerate(paths)]
+
+    storage_paths = asyncio.run(storage.upload_backups_bulk(uploads))
+
+    assert len(storage_paths) == 3
+    backups = {backup['storage_path']: backup for backup in storage.db.get_backups()}
+    for path, storage_path in zip(paths, storage_paths):
+        with open(path, 'rb') as f:
+            assert backups[storage_path]['metadata']['sha256'] == hashlib.sha256(f.read()).hexdigest()
+    storage.close()
+
+def test_upload_backups_bulk_stores_nothing_on_failure(home):
+    storage = LocalStorage()
+    paths = _make_files(home, 2) + [str(home / "missing.zip")]
+    uploads = [("App", path, {}) for path in paths]
+
+    assert asyncio.run(storage.upload_backups_bulk(uploads)) == []
+
+    assert storage.db.get_backups() == []
+    assert not any(files for _, _, files in os.walk(storage.storage_dir))
+    storage.close()
+
+def test_only_storage_directories_are_cached(home):
+    storage = LocalStorage()
+    stored = storage._get_storage_path("App", "backup.zip")
+    storage._ensure_parent_dir(stored)
+    assert os.path.dirname(stored) in storage._mkdir_cache
+
+    # A download destination removed by its owner is recreated on the next call
+    destination = str(home / "downloads" / "backup.zip")
+    storage._ensure_parent_dir(destination)
+    assert os.path.dirname(destination) not in storage._mkdir_cache
+    os.rmdir(home / "downloads")
+    storage._ensure_parent_dir(destination)
+    assert os.path.isdir(home / "downloads")
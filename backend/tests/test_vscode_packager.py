@@ -0,0 +1,139 @@
+import asyncio
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from system_sync import vscode_packager
+from system_sync.backup_manager import BackupManager
+from system_sync.vscode_packager import VSCodePackager, _ScriptTemplate, _zip_tree
+
+def test_settings_are_extracted_from_deduplicated_backup(home):
+    user_dir = home / "Code" / "User"
+    (user_dir / "snippets").mkdir(parents=True)
+    (user_dir / "settings.json").write_bytes(b'{"editor.fontSize": 14}')
+    (user_dir / "keybindings.json").write_bytes(b'[]')
+    (user_dir / "snippets" / "py.json").write_bytes(b'{}')
+
+    async def backup():
+        manager = BackupManager()
+        assert await manager.create_backup("VSCode", [{'path': str(home / "Code"), 'type': 'config'}], dedup=True)
+        return (await manager.list_backups())["VSCode"][0]['storage_path']
+
+    storage_path = asyncio.run(backup())
+    with VSCodePackager() as packager:
+        settings_data = packager.extract_settings_from_backup(storage_path)
+    assert settings_data["settings"] == {"editor.fontSize": 14}
+    assert settings_data["keybindings"] == []
+    assert settings_data["snippets"] == ["py.json"]
+
+def test_zip_tree_round_trip(tmp_path):
+    app = tmp_path / "VSCode"
+    (app / "resources").mkdir(parents=True)
+    (app / "code.js").write_bytes(b"console.log(1);\n" * 100000)
+    (app / "resources" / "icon.png").write_bytes(bytes(range(256)) * 100)
+
+    zip_path = tmp_path / "out.zip"
+    _zip_tree(str(app), str(zip_path), level=1)
+
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        assert zf.getinfo("VSCode/code.js").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo("VSCode/resources/icon.png").compress_type == zipfile.ZIP_STORED
+        assert zf.read("VSCode/code.js") == (app / "code.js").read_bytes()
+        assert "VSCode/resources/" in zf.namelist()
+
+def test_script_template_substitutes_and_unescapes():
+    template = _ScriptTemplate("@echo off\necho user@@host\n@{extensions_block}echo $HOME %APPDATA%\n")
+    assert template.substitute(extensions_block="code --list-extensions\n") == (
+        "@echo off\necho user@host\ncode --list-extensions\necho $HOME %APPDATA%\n"
+    )
+
+@pytest.mark.parametrize("render", ["_get_macos_setup_script", "_get_windows_setup_script", "_get_linux_setup_script"])
+def test_setup_scripts_render_extension_installs(render):
+    extensions = ["ms-python.python", "esbenp.prettier-vscode"]
+    with VSCodePackager() as packager:
+        script = getattr(packager, render)(extensions).decode("utf-8")
+    assert "@{" not in script
+    assert "@@" not in script
+    assert '--install-extension "ms-python.python" --install-extension "esbenp.prettier-vscode"' in script
+
+def test_windows_setup_script_keeps_batch_syntax():
+    with VSCodePackager() as packager:
+        script = packager._get_windows_setup_script([])
+    # A literal @ outside a placeholder is left alone
+    assert script.startswith(b"@echo off\r\n")
+
+class _FakeResponse:
+    def __init__(self, body, content_length):
+        self.raw = io.BytesIO(body)
+        self.headers = {"Content-Length": str(content_length), "ETag": '"v1"'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+class _FakeSession:
+    def __init__(self, body, content_length=None):
+        self.body = body
+        self.content_length = len(body) if content_length is None else content_length
+
+    def get(self, url, stream=False):
+        return _FakeResponse(self.body, self.content_length)
+
+    def close(self):
+        pass
+
+def _tarball():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tf:
+        for name, data in (("VSCode-linux-x64/code", b"binary" * 1000), ("VSCode-linux-x64/README", b"readme")):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / "vscode-cache"
+    monkeypatch.setattr(vscode_packager, "VSCODE_CACHE_DIR", str(path))
+    return path
+
+def test_tarball_reader_tees_whole_download_into_cache(cache_dir):
+    body = _tarball()
+    names = []
+    with VSCodePackager() as packager:
+        packager.session = _FakeSession(body)
+        packager._read_linux_tarball(lambda tf: names.extend(member.name for member in tf))
+        cache_path, _ = packager._cache_paths()
+    assert names == ["VSCode-linux-x64/code", "VSCode-linux-x64/README"]
+    # Bytes the tar reader never asked for, like the gzip trailer, still reach the cache
+    with open(cache_path, 'rb') as f:
+        assert f.read() == body
+
+def test_tar_extraction_tees_download_into_cache(cache_dir):
+    body = _tarball()
+    with VSCodePackager() as packager:
+        packager.session = _FakeSession(body)
+        app_path = packager.download_and_extract_linux()
+        with open(os.path.join(app_path, "README"), 'rb') as f:
+            assert f.read() == b"readme"
+        cache_path, _ = packager._cache_paths()
+    with open(cache_path, 'rb') as f:
+        assert f.read() == body
+
+def test_truncated_download_is_not_cached(cache_dir):
+    body = _tarball()
+    with VSCodePackager() as packager:
+        packager.session = _FakeSession(body, content_length=len(body) + 1)
+        packager._read_linux_tarball(lambda tf: list(tf))
+        cache_path, _ = packager._cache_paths()
+    assert not os.path.exists(cache_path)
+    assert os.listdir(cache_dir) == []